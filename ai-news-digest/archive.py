@@ -0,0 +1,127 @@
+"""Content-addressed archive of raw feed payloads for ai-news-digest.
+
+Every payload a run reads is stored once under its SHA-256, compressed with
+zstd when the `zstandard` package is installed and gzip otherwise:
+
+    archive/blobs/ab/abcdef….zst|.gz
+    archive/index/YYYY-MM-DD.jsonl   one line per source per run
+
+An unchanged feed hashes to a blob that already exists, so it only costs an
+index line. A blob is the whole document: with the archive on, the fetcher
+reads each feed to the end even after its `limit` entries are parsed (if that
+read fails, the part that arrived is kept).
+Replay streams one blob at a time through the same parser.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import gzip
+import hashlib
+import json
+import os
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # gzip it is
+    zstandard = None
+
+CHUNK = 64 * 1024
+
+
+class FeedArchive:
+    def __init__(self, root: str):
+        self.root = root
+        self.codec = "zst" if zstandard is not None else "gz"
+
+    def _blob_path(self, sha: str, codec: str) -> str:
+        return os.path.join(self.root, "blobs", sha[:2], f"{sha}.{codec}")
+
+    def _index_path(self, day: dt.date) -> str:
+        return os.path.join(self.root, "index", f"{day.isoformat()}.jsonl")
+
+    def _find_blob(self, sha: str) -> Optional[str]:
+        for codec in ("zst", "gz"):
+            path = self._blob_path(sha, codec)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put_blob(self, payload: bytes) -> str:
+        """Store `payload` unless a blob with the same hash exists; returns the hash."""
+        sha = hashlib.sha256(payload).hexdigest()
+        if self._find_blob(sha) is None:
+            path = self._blob_path(sha, self.codec)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self.codec == "zst":
+                data = zstandard.ZstdCompressor(level=10).compress(payload)
+            else:
+                data = gzip.compress(payload, compresslevel=9, mtime=0)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return sha
+
+    def record(
+        self,
+        run: float,
+        name: str,
+        url: str,
+        limit: int,
+        payload: Optional[bytes] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Append one source's outcome for run `run` (a timestamp) to that day's index."""
+        entry = {"run": run, "source": name, "url": url, "limit": limit}
+        if payload is not None:
+            entry |= {"sha256": self.put_blob(payload), "bytes": len(payload)}
+        if error is not None:
+            entry["error"] = error
+        path = self._index_path(dt.datetime.fromtimestamp(run, dt.timezone.utc).date())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def days(self, start: dt.date, end: dt.date) -> Iterator[dt.date]:
+        """Archived days in [start, end], oldest first."""
+        index = os.path.join(self.root, "index")
+        names = sorted(os.listdir(index)) if os.path.isdir(index) else []
+        for name in names:
+            try:
+                day = dt.date.fromisoformat(name.removesuffix(".jsonl"))
+            except ValueError:
+                continue
+            if start <= day <= end:
+                yield day
+
+    def last_run(self, day: dt.date) -> list[dict]:
+        """Index entries of the last run archived on `day` (UTC), in source order."""
+        path = self._index_path(day)
+        entries: list[dict] = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                e = json.loads(line)
+                if entries and e["run"] != entries[0]["run"]:
+                    entries = []
+                entries.append(e)
+        return entries
+
+    def open_chunks(self, sha: str) -> Iterator[bytes]:
+        """Decompressed contents of a blob, streamed in CHUNK-sized pieces."""
+        path = self._find_blob(sha)
+        if path is None:
+            raise FileNotFoundError(f"archive blob {sha} is missing")
+        with open(path, "rb") as raw:
+            if path.endswith(".zst"):
+                if zstandard is None:
+                    raise RuntimeError(f"{path} needs the zstandard package")
+                stream = zstandard.ZstdDecompressor().stream_reader(raw)
+            else:
+                stream = gzip.GzipFile(fileobj=raw)
+            with stream:
+                while chunk := stream.read(CHUNK):
+                    yield chunk
@@ -9,14 +9,22 @@ Why: quick, local “what’s up” + idea generator for maker loops.
 from __future__ import annotations
 
 import argparse
+import contextlib
 import datetime as dt
+import json
+import os
 import re
+import time
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Iterable, Iterator, Optional
+from xml.etree.ElementTree import ParseError, XMLPullParser
 
 import feedparser
 import requests
 
+from archive import FeedArchive
+from enrich import Enricher, ExtractCache
+
 
 @dataclass
 class Source:
@@ -32,6 +40,21 @@ SOURCES: list[Source] = [
 ]
 
 
+def load_sources(path: str) -> list[Source]:
+    """Load sources from a JSON registry.
+
+    Same format as ai-signal-radar's sources.json ({"sources": [{"name", "url", ...}]});
+    non-RSS entries are skipped and a missing `limit` defaults to 8.
+    """
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    return [
+        Source(e["name"], e["url"], limit=int(e.get("limit", 8)))
+        for e in cfg.get("sources", [])
+        if e.get("kind", "rss") == "rss"
+    ]
+
+
 def _clean(s: str) -> str:
     s = re.sub(r"\s+", " ", (s or "").strip())
     return s
@@ -50,6 +73,136 @@ def fetch_feed(url: str, timeout: int = 20) -> feedparser.FeedParserDict:
     return feedparser.parse(r.text)
 
 
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _entry_item(elem) -> Optional[dict]:
+    """Title/link/published of one RSS <item> or Atom <entry>, mirroring what feedparser reports."""
+    title = link = published = guid = ""
+    for child in elem:
+        name = _local(child.tag)
+        if name == "title":
+            title = "".join(child.itertext())
+        elif name == "link":
+            href = child.get("href")
+            if href is None:
+                link = link or (child.text or "")
+            elif child.get("rel", "alternate") == "alternate" and not link:
+                link = href
+        elif name in ("pubDate", "published", "issued") and not published:
+            published = child.text or ""
+        elif name == "guid" and child.get("isPermaLink", "true") != "false":
+            guid = child.text or ""
+    title, link = _clean(title), _clean(link or guid)
+    if not title and not link:
+        return None
+    return {"title": title, "link": link, "published": _clean(published)}
+
+
+def parse_items(chunks: Iterable[bytes], limit: int, stats: Optional[dict] = None) -> list[dict]:
+    """First `limit` items of an RSS/Atom document arriving as byte chunks, consuming only as many chunks as needed.
+
+    Chunks go to an incremental XML parser and iteration stops as soon as
+    `limit` entries with a title or link have been seen, so time and memory
+    scale with `limit` rather than feed size. Anything the strict parser
+    rejects is read to the end and handed to feedparser. With `stats`, parse
+    time and the parser used ("stream" or "fallback") are recorded into it.
+    """
+    buf: list[bytes] = []
+    items: list[dict] = []
+    parse_s = 0.0
+    parser: Optional[XMLPullParser] = XMLPullParser(events=("start", "end"))
+    root_seen = False
+    for chunk in chunks:
+        buf.append(chunk)
+        if parser is None:
+            continue  # fallback: just collect the rest
+        p0 = time.perf_counter()
+        try:
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                name = _local(elem.tag)
+                if event == "start":
+                    if not root_seen:
+                        root_seen = True
+                        if name not in ("rss", "feed", "RDF"):
+                            raise ParseError(f"not a feed: <{name}>")
+                    continue
+                if name in ("item", "entry"):
+                    it = _entry_item(elem)
+                    elem.clear()
+                    if it is not None:
+                        items.append(it)
+                        if len(items) >= limit:
+                            break
+        except ParseError:
+            parser = None
+        parse_s += time.perf_counter() - p0
+        if len(items) >= limit:
+            break
+    p0 = time.perf_counter()
+    if parser is not None and len(items) < limit:
+        try:
+            parser.close()
+        except ParseError:
+            parser = None
+    if parser is None:
+        items = pick_items(feedparser.parse(b"".join(buf)), limit)
+    parse_s += time.perf_counter() - p0
+    if stats is not None:
+        stats.update(parse_s=round(parse_s, 6), parser="stream" if parser is not None else "fallback")
+    return items
+
+
+def fetch_items(
+    url: str, limit: int, timeout: int = 20, trace: Optional[dict] = None, raw: Optional[list[bytes]] = None
+) -> list[dict]:
+    """Fetch the first `limit` items of a feed, dropping the connection once they are parsed.
+
+    With `raw` (for the archive), the whole body is appended to it: once the
+    parser has its items the rest of the feed is still read, just not parsed.
+    If reading that tail fails, the items are kept and `raw` holds what arrived.
+    """
+    t0 = time.perf_counter()
+    r = requests.get(
+        url,
+        timeout=timeout,
+        headers={
+            "User-Agent": "ai-news-digest/0.1 (+https://github.com/openclaw/openclaw)"
+        },
+        stream=True,
+    )
+    t1 = time.perf_counter()
+    nbytes = 0
+    stats: dict = {}
+
+    def body() -> Iterator[bytes]:
+        nonlocal nbytes
+        for chunk in r.iter_content(chunk_size=16384):
+            nbytes += len(chunk)
+            if raw is not None:
+                raw.append(chunk)
+            yield chunk
+
+    try:
+        r.raise_for_status()
+        chunks = body()
+        items = parse_items(chunks, limit, stats)
+        if raw is not None:
+            try:
+                for _ in chunks:  # archive the full document, not just the parsed prefix
+                    pass
+            except requests.RequestException as e:
+                print(f"{url}: archiving a partial feed, reading the rest failed: {e.__class__.__name__}: {e}")
+    finally:
+        r.close()
+        if trace is not None:
+            trace.update(ttfb_s=round(t1 - t0, 6), bytes=nbytes, status=r.status_code, **stats)
+            trace["download_s"] = round(time.perf_counter() - t1 - stats.get("parse_s", 0.0), 6)
+    return items
+
+
 def pick_items(parsed: feedparser.FeedParserDict, limit: int) -> list[dict]:
     items = []
     for entry in (parsed.entries or [])[:limit]:
@@ -60,8 +213,8 @@ def pick_items(parsed: feedparser.FeedParserDict, limit: int) -> list[dict]:
     return items
 
 
-def render_markdown(sections: list[tuple[str, list[dict]]]) -> str:
-    now = dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+def render_markdown(sections: list[tuple[str, list[dict]]], generated: Optional[dt.datetime] = None) -> str:
+    now = (generated or dt.datetime.utcnow()).replace(microsecond=0).isoformat() + "Z"
     lines: list[str] = []
     lines.append(f"# AI News Digest ({now})")
     lines.append("")
@@ -75,6 +228,8 @@ def render_markdown(sections: list[tuple[str, list[dict]]]) -> str:
         for it in items:
             pub = f" — {it['published']}" if it.get("published") else ""
             lines.append(f"- [{it['title']}]({it['link']}){pub}")
+            if it.get("extract"):
+                lines.append(f"  > {it['extract']}")
         lines.append("")
 
     # Simple heuristics to propose build ideas
@@ -87,26 +242,160 @@ def render_markdown(sections: list[tuple[str, list[dict]]]) -> str:
     return "\n".join(lines)
 
 
-def main() -> int:
+def replay_sections(archive: FeedArchive, day: dt.date) -> tuple[Optional[dt.datetime], list[tuple[str, list[dict]]]]:
+    """Rebuild the sections of the last run archived on `day` without touching the network."""
+    entries = archive.last_run(day)
+    if not entries:
+        return None, []
+    sections: list[tuple[str, list[dict]]] = []
+    for e in entries:
+        if "sha256" not in e:
+            sections.append((f"{e['source']} (error: {e.get('error', 'unknown')})", []))
+            continue
+        with contextlib.closing(archive.open_chunks(e["sha256"])) as chunks:
+            sections.append((e["source"], parse_items(chunks, e["limit"])))
+    generated = dt.datetime.fromtimestamp(entries[0]["run"], dt.timezone.utc).replace(tzinfo=None)
+    return generated, sections
+
+
+def replay(archive: FeedArchive, spec: str, out: str) -> int:
+    """Re-render DATE or each archived day in DATE:DATE; a range writes `out` with the date inserted."""
+    start_s, _, end_s = spec.partition(":")
+    start = dt.date.fromisoformat(start_s)
+    end = dt.date.fromisoformat(end_s) if end_s else start
+    root, ext = os.path.splitext(out)
+    found = 0
+    for day in archive.days(start, end):
+        generated, sections = replay_sections(archive, day)
+        if generated is None:
+            continue
+        path = out if start == end else f"{root}-{day.isoformat()}{ext}"
+        md = render_markdown(sections, generated)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(md)
+        print(f"Wrote {path} ({len(md)} bytes, replayed {day})")
+        found += 1
+    if not found:
+        print(f"No archived runs for {spec} in {archive.root}")
+        return 1
+    return 0
+
+
+def write_trace(records: list[dict], stages: dict[str, float], jsonl: Optional[str], prom: Optional[str]) -> None:
+    """Append trace records to a JSONL file and/or write a Prometheus textfile."""
+    run = time.time()
+    if jsonl:
+        with open(jsonl, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps({"run": run, "type": "source", **rec}) + "\n")
+            for name, seconds in stages.items():
+                f.write(json.dumps({"run": run, "type": "stage", "stage": name, "seconds": seconds}) + "\n")
+    if prom:
+        lines = ["# TYPE digest_stage_seconds gauge"]
+        lines += [f'digest_stage_seconds{{stage="{k}"}} {v}' for k, v in stages.items()]
+        for key in ("ttfb_s", "download_s", "parse_s", "bytes", "items"):
+            name = f"digest_source_{key[:-2] + '_seconds' if key.endswith('_s') else key}"
+            lines.append(f"# TYPE {name} gauge")
+            for rec in records:
+                if rec.get(key) is not None:
+                    label = rec["source"].replace("\\", "\\\\").replace('"', '\\"')
+                    lines.append(f'{name}{{source="{label}"}} {rec[key]}')
+        lines.append(f"digest_last_run_timestamp_seconds {run}")
+        with open(prom + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(prom + ".tmp", prom)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="digest.md", help="Output markdown path")
-    args = ap.parse_args()
+    ap.add_argument("--sources", help="JSON source registry (default: built-in SOURCES)")
+    ap.add_argument("--extracts", action="store_true", help="fetch each linked article and add a short extract")
+    ap.add_argument("--extract-workers", type=int, default=8, help="max article fetches in flight (default: 8)")
+    ap.add_argument("--extract-per-host", type=int, default=2, help="max article fetches in flight per host (default: 2)")
+    ap.add_argument("--extract-max-bytes", type=int, default=256 * 1024, help="stop reading an article after this many bytes")
+    ap.add_argument("--extract-cache", default=".cache/extracts.json", help="extract cache file ('' to disable)")
+    ap.add_argument(
+        "--archive",
+        default="",
+        help="keep raw feeds in this directory (off by default; reads every feed to the end)",
+    )
+    ap.add_argument(
+        "--replay",
+        metavar="DATE[:DATE]",
+        help="rebuild the digest from the archive instead of fetching (a range writes one file per day)",
+    )
+    ap.add_argument("--trace-jsonl", help="append per-source/per-stage timings to this JSONL file")
+    ap.add_argument("--prom-textfile", help="write per-source/per-stage timings as a Prometheus textfile")
+    args = ap.parse_args(argv)
+    tracing = bool(args.trace_jsonl or args.prom_textfile)
+    archive = FeedArchive(args.archive) if args.archive else None
 
+    if args.replay:
+        if archive is None:
+            ap.error("--replay needs --archive DIR")
+        if args.extracts:
+            ap.error("--replay does not fetch, so it cannot add --extracts")
+        try:
+            return replay(archive, args.replay, args.out)
+        except ValueError as e:
+            ap.error(f"--replay: {e}")
+
+    sources = load_sources(args.sources) if args.sources else SOURCES
+
+    records: list[dict] = []
     sections: list[tuple[str, list[dict]]] = []
-    for src in SOURCES:
+    run = time.time()
+    t_fetch = time.perf_counter()
+    for src in sources:
+        rec: Optional[dict] = {"source": src.name} if tracing else None
+        if rec is not None:
+            records.append(rec)
+        raw: Optional[list[bytes]] = [] if archive is not None else None
         try:
-            parsed = fetch_feed(src.url)
-            items = pick_items(parsed, src.limit)
+            items = fetch_items(src.url, src.limit, trace=rec, raw=raw)
         except Exception as e:  # noqa: BLE001
             items = []
+            if rec is not None:
+                rec["error"] = f"{e.__class__.__name__}: {e}"
+            if archive is not None:
+                archive.record(run, src.name, src.url, src.limit, error=e.__class__.__name__)
             sections.append((f"{src.name} (error: {e.__class__.__name__})", items))
             continue
+        if archive is not None:
+            archive.record(run, src.name, src.url, src.limit, payload=b"".join(raw))
+        if rec is not None:
+            rec["items"] = len(items)
         sections.append((src.name, items))
+    t_enrich = time.perf_counter()
+
+    if args.extracts:
+        cache = ExtractCache(args.extract_cache or None)
+        enricher = Enricher(
+            cache,
+            workers=args.extract_workers,
+            per_host=args.extract_per_host,
+            max_bytes=args.extract_max_bytes,
+        )
+        try:
+            counts = enricher.enrich(sections)
+        finally:
+            enricher.close()
+        cache.save()
+        print(f"Extracts: {counts['fetched']} fetched, {counts['cached']} cached")
+    t_render = time.perf_counter()
 
     md = render_markdown(sections)
     with open(args.out, "w", encoding="utf-8") as f:
         f.write(md)
 
+    if tracing:
+        stages = {"fetch": round(t_enrich - t_fetch, 6)}
+        if args.extracts:
+            stages["enrich"] = round(t_render - t_enrich, 6)
+        stages |= {"render": round(time.perf_counter() - t_render, 6)}
+        write_trace(records, stages, args.trace_jsonl, args.prom_textfile)
+
     print(f"Wrote {args.out} ({len(md)} bytes)")
     return 0
 
@@ -0,0 +1,238 @@
+"""Optional article enrichment for ai-news-digest.
+
+Fetches each picked item's link and attaches a short extract: the page's meta
+description when it has one, else the opening paragraphs. Pages are fetched in
+parallel over one pooled session with a global and a per-host concurrency
+limit: each host gets at most `per_host` lanes that work through its URLs in
+turn, so a section full of one site's links can't fill the pool with threads
+waiting on that site. Each response is read incrementally and dropped as soon as the extract
+is found or `max_bytes` have arrived. Extracts are cached by URL in a small
+JSON file so repeat runs only fetch new links.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "ai-news-digest/0.1 (+https://github.com/openclaw/openclaw)"
+EXTRACT_CHARS = 300
+_SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "template"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class _ExtractParser(HTMLParser):
+    """Incremental HTML scan; `done` flips once there is enough text to stop reading."""
+
+    def __init__(self, want: int):
+        super().__init__(convert_charrefs=True)
+        self.want = want
+        self.description = ""
+        self.paragraphs: list[str] = []
+        self.chars = 0
+        self.done = False
+        self._skip = 0
+        self._para: Optional[list[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            if tag == "meta" and not self.description:
+                a = dict(attrs)
+                if (a.get("name") or a.get("property") or "").lower() in ("description", "og:description"):
+                    self.description = _squash(a.get("content") or "")
+            return
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag == "p" and not self._skip:
+            self._para = []
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "head" and self.description:
+            self.done = True
+        elif tag == "p" and self._para is not None:
+            text = _squash("".join(self._para))
+            self._para = None
+            if len(text) >= 40:  # skip bylines, captions, cookie nags
+                self.paragraphs.append(text)
+                self.chars += len(text)
+                self.done = self.chars >= self.want
+
+    def handle_data(self, data):
+        if self._para is not None and not self._skip:
+            self._para.append(data)
+
+    def extract(self) -> str:
+        return self.description or " ".join(self.paragraphs)
+
+
+def _squash(s: str) -> str:
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _shorten(s: str, n: int = EXTRACT_CHARS) -> str:
+    if len(s) <= n:
+        return s
+    cut = s[:n].rsplit(" ", 1)[0]
+    return cut.rstrip(",;:-–— ") + "…"
+
+
+def _charset(content_type: str) -> str:
+    m = re.search(r"charset=[\"']?([\w.:-]+)", content_type, re.I)
+    try:
+        return codecs.lookup(m.group(1)).name if m else "utf-8"
+    except LookupError:
+        return "utf-8"
+
+
+def extract_html(chunks, want: int = EXTRACT_CHARS, encoding: str = "utf-8") -> str:
+    """Extract from an iterable of byte chunks, consuming only as many as needed."""
+    p = _ExtractParser(want)
+    decode = codecs.getincrementaldecoder(encoding)(errors="replace").decode
+    for chunk in chunks:
+        p.feed(decode(chunk))
+        if p.done:
+            break
+    return _shorten(p.extract())
+
+
+class ExtractCache:
+    """URL -> extract, persisted as one JSON file; entries expire after `ttl` seconds."""
+
+    def __init__(self, path: Optional[str], ttl: float = 30 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self.entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, url: str) -> Optional[str]:
+        e = self.entries.get(url)
+        if e is None or time.time() - e["ts"] > self.ttl:
+            return None
+        return e["extract"]
+
+    def put(self, url: str, extract: str) -> None:
+        with self._lock:
+            self.entries[url] = {"extract": extract, "ts": time.time()}
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        now = time.time()
+        live = {u: e for u, e in self.entries.items() if now - e["ts"] <= self.ttl}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(live, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+class Enricher:
+    def __init__(
+        self,
+        cache: Optional[ExtractCache] = None,
+        workers: int = 8,
+        per_host: int = 2,
+        max_bytes: int = 256 * 1024,
+        timeout: float = 10.0,
+    ):
+        self.cache = cache or ExtractCache(None)
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch_extract(self, url: str) -> str:
+        with self.session.get(url, timeout=self.timeout, stream=True) as r:
+            r.raise_for_status()
+            ctype = r.headers.get("Content-Type", "text/html")
+            if "html" not in ctype.lower():
+                return ""
+            budget = self.max_bytes
+
+            def capped():
+                nonlocal budget
+                for chunk in r.iter_content(chunk_size=16384):
+                    yield chunk[:budget]
+                    budget -= len(chunk)
+                    if budget <= 0:
+                        return
+
+            return extract_html(capped(), encoding=_charset(ctype))
+
+    def _one(self, url: str) -> str:
+        try:
+            text = self.fetch_extract(url)
+        except requests.RequestException:
+            return ""
+        self.cache.put(url, text)
+        return text
+
+    def _lane(self, queue: deque, out: dict) -> None:
+        # Several lanes of one host share its queue; popleft is atomic.
+        while True:
+            try:
+                url = queue.popleft()
+            except IndexError:
+                return
+            out[url] = self._one(url)
+
+    def _lanes(self, urls) -> list[deque]:
+        """Up to `per_host` lanes per host, interleaved across hosts so every host starts early."""
+        queues: dict[str, deque] = {}
+        for url in urls:
+            queues.setdefault(urlsplit(url).netloc.lower(), deque()).append(url)
+        rounds = [[q for q in queues.values() if len(q) > i] for i in range(self.per_host)]
+        return [q for lanes in rounds for q in lanes]
+
+    def enrich(self, sections: list[tuple[str, list[dict]]]) -> dict[str, int]:
+        """Set `extract` on every item with a link, in place; returns fetched/cached counts."""
+        todo: dict[str, list[dict]] = {}
+        cached = 0
+        for _, items in sections:
+            for it in items:
+                url = it.get("link")
+                if not url or not url.startswith(("http://", "https://")):
+                    continue
+                hit = self.cache.get(url)
+                if hit is not None:
+                    it["extract"] = hit
+                    cached += 1
+                else:
+                    todo.setdefault(url, []).append(it)
+        if todo:
+            texts: dict[str, str] = {}
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="digest-enrich") as pool:
+                for f in [pool.submit(self._lane, q, texts) for q in self._lanes(todo)]:
+                    f.result()
+            for url, items in todo.items():
+                for it in items:
+                    it["extract"] = texts.get(url, "")
+        return {"fetched": len(todo), "cached": cached}
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+# One JSON file per feed URL: validators from the last 200 plus the items we
+# parsed out of it, so a 304 can skip feedparser entirely.
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+class FeedCache:
+    """Persistent conditional-GET cache for feed responses, keyed by URL."""
+
+    def __init__(self, root: str, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES, max_stale: float = 0.0):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url or time.time() - entry.get("checked_at", 0) > self.ttl:
+            return None
+        return entry
+
+    def validators(self, entry: dict, limit: int) -> dict:
+        """Conditional request headers, or {} if the cached copy can't serve `limit` items."""
+        if entry.get("limit", 0) < limit and entry.get("truncated", True):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, headers, limit: int, items: list[dict], truncated: bool) -> None:
+        now = time.time()
+        entry = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": now,
+            "checked_at": now,
+            "limit": limit,
+            "truncated": truncated,
+            "items": items,
+        }
+        self._write(url, entry)
+
+    def touch(self, url: str, entry: dict) -> None:
+        """Record a successful revalidation (304)."""
+        entry["checked_at"] = time.time()
+        self._write(url, entry)
+
+    def stale(self, url: str) -> Optional[dict]:
+        """Entry to serve when a fetch fails, if it is within `max_stale` seconds."""
+        if self.max_stale <= 0:
+            return None
+        entry = self.get(url)
+        if entry is None or time.time() - entry.get("checked_at", 0) > self.max_stale:
+            return None
+        return entry
+
+    def _write(self, url: str, entry: dict) -> None:
+        path = self._path(url)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    def prune(self) -> int:
+        """Drop expired entries, then the least recently used ones until under `max_bytes`."""
+        now = time.time()
+        files = []
+        removed = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if now - st.st_mtime > self.ttl:
+                os.remove(path)
+                removed += 1
+            else:
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
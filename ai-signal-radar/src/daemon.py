@@ -0,0 +1,122 @@
+"""Long-running radar: poll each source on its own schedule and republish.
+
+State is just the latest item list per source, so memory stays flat no matter
+how long the process runs. Fetching, rendering and writing are injected by
+`radar.main`, which keeps one pooled session and feed cache for the lifetime
+of the process.
+"""
+
+from __future__ import annotations
+
+import copy
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+import requests
+
+MAX_BACKOFF = 6 * 3600.0
+# First retry after a plain failure; doubles per consecutive failure up to the source interval.
+RETRY_BASE = 60.0
+
+
+def _retry_after(e: BaseException) -> Optional[float]:
+    resp = getattr(e, "response", None)
+    if not isinstance(e, requests.HTTPError) or resp is None or resp.status_code != 429:
+        return None
+    try:
+        return float(resp.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class RadarDaemon:
+    def __init__(
+        self,
+        sources: list,
+        fetch: Callable[[object], list],
+        publish: Callable[[list], None],
+        placeholder: Callable[[object, BaseException], list],
+        write_every: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.sources = sources
+        self.fetch = fetch
+        self.publish = publish
+        self.placeholder = placeholder
+        self.write_every = write_every
+        self.clock = clock
+        self.items: dict[str, list] = {src.name: [] for src in sources}
+        self.next_due: dict[str, float] = {src.name: 0.0 for src in sources}
+        self.failures: dict[str, int] = {src.name: 0 for src in sources}
+        self._attempted: set[str] = set()
+        self._stop = threading.Event()
+        self._dirty = False
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _done(self, src, fut: Future, now: float) -> None:
+        self._attempted.add(src.name)
+        e = fut.exception()
+        if e is None:
+            self.items[src.name] = fut.result()
+            self.failures[src.name] = 0
+            self.next_due[src.name] = now + src.interval
+            self._dirty = True
+            return
+        n = self.failures[src.name] = self.failures[src.name] + 1
+        retry_after = _retry_after(e)
+        if retry_after is not None:
+            # Rate-limited: back off past both the server's hint and our own interval.
+            delay = max(retry_after, src.interval * 2 ** (n - 1))
+        else:
+            delay = min(src.interval, RETRY_BASE * 2 ** (n - 1))
+        self.next_due[src.name] = now + min(delay, MAX_BACKOFF)
+        print(f"[radar] {src.name}: {type(e).__name__}: {e} (retry in {delay:.0f}s)", file=sys.stderr)
+        if not self.items[src.name]:
+            self.items[src.name] = self.placeholder(src, e)
+            self._dirty = True
+
+    def snapshot(self) -> list:
+        """Current groups in source order, as copies the pipeline is free to mutate."""
+        return [(src.name, [copy.copy(it) for it in self.items[src.name]]) for src in self.sources]
+
+    def run(self) -> None:
+        pool = ThreadPoolExecutor(max_workers=max(1, len(self.sources)), thread_name_prefix="radar-poll")
+        inflight: dict[str, tuple[object, Future]] = {}
+        last_write: Optional[float] = None
+        try:
+            while not self._stop.is_set():
+                now = self.clock()
+                for src in self.sources:
+                    if src.name not in inflight and now >= self.next_due[src.name]:
+                        inflight[src.name] = (src, pool.submit(self.fetch, src))
+
+                for name, (src, fut) in list(inflight.items()):
+                    if fut.done():
+                        del inflight[name]
+                        self._done(src, fut, now)
+
+                # Publish once every source has had its first attempt, then at most every write_every.
+                ready = len(self._attempted) == len(self.sources)
+                if self._dirty and ready and (last_write is None or now - last_write >= self.write_every):
+                    try:
+                        self.publish(self.snapshot())
+                    except Exception as e:  # noqa: BLE001
+                        print(f"[radar] publish failed: {type(e).__name__}: {e}", file=sys.stderr)
+                    self._dirty = False
+                    last_write = now
+
+                wake = min(self.next_due.values(), default=now + 60) - now
+                if self._dirty and last_write is not None:
+                    wake = min(wake, last_write + self.write_every - now)
+                wake = max(0.05, min(wake, 60.0))
+                if inflight:
+                    wait([f for _, f in inflight.values()], timeout=wake, return_when=FIRST_COMPLETED)
+                else:
+                    self._stop.wait(wake)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
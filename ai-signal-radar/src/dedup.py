@@ -0,0 +1,117 @@
+"""Cross-source deduplication for radar items.
+
+Items are merged when their canonical URLs match or their titles are near
+duplicates. Titles are compared with MinHash signatures bucketed by LSH bands,
+so each item is only checked against the handful that share a bucket.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+import zlib
+from collections import defaultdict
+from typing import Optional
+
+from .urls import canonical_url
+
+_WORDS = re.compile(r"[a-z0-9]+")
+_PRIME = (1 << 61) - 1
+_NUM_PERM = 32
+_BANDS = 8  # 8 bands x 4 rows: pairs above ~0.6 Jaccard almost always collide
+_ROWS = _NUM_PERM // _BANDS
+# Deterministic (a, b) pairs for the universal hashes h(x) = (a * x + b) mod p.
+_PERMS = [((i * 0x9E3779B97F4A7C15 + 1) % _PRIME | 1, (i * 0xC2B2AE3D27D4EB4F + 7) % _PRIME) for i in range(_NUM_PERM)]
+
+
+def shingles(title: str) -> set[str]:
+    """Lowercased alphanumeric words of the title; punctuation and order don't matter."""
+    return set(_WORDS.findall(title.lower()))
+
+
+@functools.lru_cache(maxsize=65536)
+def _shingle_hashes(sh: str) -> tuple[int, ...]:
+    # Title vocabulary repeats heavily across items and runs, so hash each word once.
+    x = zlib.crc32(sh.encode("utf-8"))
+    return tuple((a * x + b) % _PRIME for a, b in _PERMS)
+
+
+def minhash(sh: set[str]) -> tuple[int, ...]:
+    return tuple(map(min, *(_shingle_hashes(s) for s in sh))) if len(sh) > 1 else _shingle_hashes(next(iter(sh)))
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            # Keep the earlier item as the root so clusters render in source order.
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def _key_url(it) -> str:
+    return canonical_url(getattr(it, "target_url", None) or it.url)
+
+
+def dedupe(groups: list, threshold: float = 0.7) -> list:
+    """Merge duplicates across `groups` ([(name, items)]), keeping group order.
+
+    Each cluster is represented by its first item, which gets the other members'
+    sources in `also` and the sum of their scores; the other members are dropped.
+    """
+    flat = [(gi, it) for gi, (_, items) in enumerate(groups) for it in items]
+    uf = _UnionFind(len(flat))
+    by_url: dict[str, int] = {}
+    buckets: dict[tuple, list[int]] = defaultdict(list)
+    sigs: list[Optional[set[str]]] = []
+
+    for i, (_, it) in enumerate(flat):
+        if it.title.startswith("(fetch failed"):
+            sigs.append(None)
+            continue
+        key = _key_url(it)
+        if key in by_url:
+            uf.union(by_url[key], i)
+        else:
+            by_url[key] = i
+        sh = shingles(it.title)
+        sigs.append(sh)
+        if not sh:
+            continue
+        sig = minhash(sh)
+        for b in range(_BANDS):
+            bucket = buckets[(b, sig[b * _ROWS : (b + 1) * _ROWS])]
+            for j in bucket:
+                if uf.find(i) != uf.find(j) and jaccard(sh, sigs[j]) >= threshold:
+                    uf.union(i, j)
+            bucket.append(i)
+
+    members: dict[int, list[int]] = defaultdict(list)
+    for i in range(len(flat)):
+        members[uf.find(i)].append(i)
+
+    out: list = [(name, []) for name, _ in groups]
+    for i, (gi, it) in enumerate(flat):
+        if uf.find(i) != i:
+            continue
+        rest = [flat[j][1] for j in members[i][1:]]
+        if rest:
+            scores = [x.score for x in [it, *rest] if x.score is not None]
+            it.score = sum(scores) if scores else None
+            it.also = list(dict.fromkeys(x.source for x in rest if x.source != it.source))
+        out[gi][1].append(it)
+    return out
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Union
+
+
+@dataclass(frozen=True)
+class Keyword:
+    text: str
+    weight: float = 1.0
+    mode: str = "substring"  # "substring", "prefix" (word start) or "word" (whole word)
+
+    @property
+    def label(self) -> str:
+        """The spec without its weight (`llm`, `=ai`, `fine-tun*`), as reported in `matched`."""
+        if self.mode == "word":
+            return f"={self.text}"
+        if self.mode == "prefix":
+            return f"{self.text}*"
+        return self.text
+
+
+def parse_keyword(spec: str) -> Keyword:
+    """Parse a keyword spec.
+
+    `llm` matches anywhere, `=ai` only as a whole word, `fine-tun*` only at a word
+    start, and a `:N` suffix sets the weight (`agent:2`).
+    """
+    text = spec.strip()
+    weight = 1.0
+    head, sep, tail = text.rpartition(":")
+    if sep and head:
+        try:
+            weight = float(tail)
+            text = head
+        except ValueError:
+            pass
+    mode = "substring"
+    if text.startswith("=") and len(text) > 1:
+        mode, text = "word", text[1:]
+    elif text.endswith("*") and len(text) > 1:
+        mode, text = "prefix", text[:-1]
+    return Keyword(text=text.lower(), weight=weight, mode=mode)
+
+
+def _pattern(kw: Keyword) -> str:
+    p = re.escape(kw.text)
+    if kw.mode in ("word", "prefix"):
+        p = r"(?<!\w)" + p
+    if kw.mode == "word":
+        p += r"(?!\w)"
+    return p
+
+
+class KeywordMatcher:
+    """All keywords compiled into one case-insensitive alternation, built once per run."""
+
+    def __init__(self, keywords: Iterable[Union[str, Keyword]]):
+        by_label: dict[str, Keyword] = {}
+        for kw in keywords:
+            kw = parse_keyword(kw) if isinstance(kw, str) else kw
+            if kw.text:
+                by_label[kw.label] = kw  # a repeated spec keeps its last weight
+        self.keywords: list[Keyword] = list(by_label.values())
+        # Keyed by label, so `ai` and `=ai` keep their own weights.
+        self._weights = {kw.label: kw.weight for kw in self.keywords}
+        # Candidates per first character, so each offset only tries keywords that can start there.
+        self._by_first: dict[str, list] = {}
+        for kw in self.keywords:
+            self._by_first.setdefault(kw.text[0], []).append((kw.label, re.compile(_pattern(kw), re.IGNORECASE)))
+        self._regex = None
+        if self.keywords:
+            # One scan finds every offset where some keyword starts (the lookahead lets
+            # matches overlap); the keywords starting with that character are then tried
+            # there, since the alternation reports only one of several at the same offset.
+            alts = "|".join(_pattern(kw) for kw in self.keywords)
+            self._regex = re.compile(f"(?=(?:{alts}))", re.IGNORECASE)
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords)
+
+    def match(self, text: str) -> list[str]:
+        """Labels of the keywords found in `text`, in first-seen order, without duplicates."""
+        if self._regex is None:
+            return []
+        seen: dict[str, None] = {}
+        for m in self._regex.finditer(text):
+            pos = m.start()
+            for label, pattern in self._by_first.get(text[pos].lower(), ()):
+                if label not in seen and pattern.match(text, pos):
+                    seen[label] = None
+            if len(seen) == len(self.keywords):
+                break
+        return list(seen)
+
+    def weight(self, matched: Iterable[str]) -> float:
+        return sum(self._weights.get(k, 0.0) for k in matched)
+
+    def partition(self, items: Iterable) -> tuple[list, list]:
+        """Split items into (matches, non-matches) in one pass, tagging `item.matched`."""
+        hits: list = []
+        misses: list = []
+        for it in items:
+            it.matched = self.match(it.title)
+            (hits if it.matched else misses).append(it)
+        return hits, misses
@@ -2,17 +2,35 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
+import email.utils
+import functools
 import json
 import os
 import re
+import signal
 import sys
-from dataclasses import dataclass
-from typing import Optional
+import math
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field, fields
+from typing import Iterable, Iterator, Optional, TextIO, Union
 
 import feedparser
 import requests
 from dateutil import tz
 from dateutil import parser as dateparser
+from requests.adapters import HTTPAdapter
+
+from .cache import FeedCache
+from .dedup import dedupe
+from .keywords import KeywordMatcher
+from .rank import TOP_GROUP, Ranker, top_ranked
+from .seen import SeenStore
+from .sources import HostScheduler, Source, load_sources
+from .trace import NULL_TRACE, Trace, TimingAdapter, current, timed_get
+from .urls import is_reddit, reddit_link_target
 
 HF_BLOG_RSS = "https://huggingface.co/blog/feed.xml"
 ARXIV_CSAI_RSS = "https://export.arxiv.org/rss/cs.AI"
@@ -20,36 +38,63 @@ LOCAL_LLAMMA_RSS = "https://www.reddit.com/r/LocalLLaMA/.rss"
 MACHINE_LEARNING_RSS = "https://www.reddit.com/r/MachineLearning/.rss"
 HN_ALGOLIA_LLM = "https://hn.algolia.com/api/v1/search?query=llm&tags=story&hitsPerPage=30"
 
+# Default registry; overridden by sources.json (or --sources).
+DEFAULT_SOURCES_PATH = os.path.join(os.path.dirname(__file__), "..", "sources.json")
+
 USER_AGENT = "ai-signal-radar/0.1 (+https://github.com/openclaw/openclaw)"
 
 # Default keyword filters for AI/LLM signals
 DEFAULT_KEYWORDS = ["llm", "gpt", "model", "ai", "transformer", "clip", "embedding", "rag", "fine-tun", "agent", "eval", "benchmark"]
 
 
-def _matches_keywords(title: str, keywords: list[str]) -> bool:
-    """Check if title matches any keyword (case-insensitive)."""
-    title_lower = title.lower()
-    return any(kw.lower() in title_lower for kw in keywords)
-
+def filter_by_keywords(items: list, keywords, include_all: bool = False):
+    """Filter items by keywords. If include_all=True, keep items even if no match (for broad discovery).
 
-def filter_by_keywords(items: list, keywords: list, include_all: bool = False):
-    """Filter items by keywords. If include_all=True, keep items even if no match (for broad discovery)."""
-    if not keywords:
+    `keywords` is a list of keyword specs or a prebuilt KeywordMatcher; matched
+    keywords are recorded on each item's `matched` field.
+    """
+    matcher = keywords if isinstance(keywords, KeywordMatcher) else KeywordMatcher(keywords or [])
+    if not matcher:
         return items
-    filtered = [it for it in items if _matches_keywords(it.title, keywords)]
+    filtered, rest = matcher.partition(items)
     if include_all:
         # Keep all items but prioritize matches
-        return filtered + [it for it in items if it not in filtered]
+        return filtered + rest
     return filtered
 
 
-@dataclass
+def filter_since(items: list, since_ts: int) -> list:
+    """Items published at or after `since_ts` (UTC epoch); items with no parseable date are kept."""
+    return [it for it in items if it.published_ts is None or it.published_ts >= since_ts]
+
+
+@dataclass(slots=True)
 class Item:
     source: str
     title: str
     url: str
     published: Optional[str] = None
     score: Optional[int] = None
+    matched: list[str] = field(default_factory=list)
+    # `published` normalized once at ingest to UTC epoch seconds (None if unparseable).
+    published_ts: Optional[int] = None
+    # External page a link post (reddit) points at, used for deduplication.
+    target_url: Optional[str] = None
+    # Other sources that carried the same story (filled in by dedupe).
+    also: list[str] = field(default_factory=list)
+    # Relevance score from Ranker (None until ranked).
+    rank: Optional[float] = None
+
+
+SOURCES: list[Source] = [
+    Source("Hugging Face — Blog", HF_BLOG_RSS),
+    # arXiv rss export sometimes has no entries on weekends (skipDays).
+    Source("arXiv — cs.AI", ARXIV_CSAI_RSS, interval=86400),
+    # Reddit RSS is rate-limited occasionally.
+    Source("Reddit — r/LocalLLaMA", LOCAL_LLAMMA_RSS, interval=900),
+    Source("Reddit — r/MachineLearning", MACHINE_LEARNING_RSS, interval=900),
+    Source("Hacker News", HN_ALGOLIA_LLM, kind="hn", interval=300),
+]
 
 
 def _clean(s: str) -> str:
@@ -57,24 +102,148 @@ def _clean(s: str) -> str:
     return s
 
 
-def fetch_rss(url: str, source: str, limit: int, timeout: int = 20) -> list[Item]:
+@functools.lru_cache(maxsize=4096)
+def _parse_ts_slow(s: str) -> Optional[int]:
+    try:
+        d = dateparser.parse(s)
+    except (ValueError, OverflowError):
+        return None
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=tz.UTC)
+    return int(d.timestamp())
+
+
+def parse_ts(s: Optional[str]) -> Optional[int]:
+    """UTC epoch seconds for an RSS/Atom/ISO date string; naive dates are taken as UTC."""
+    if not s:
+        return None
+    s = str(s).strip()
+    d = None
+    if s[:1].isdigit():
+        try:
+            d = dt.datetime.fromisoformat(s[:-1] + "+00:00" if s.endswith("Z") else s)
+        except ValueError:
+            pass
+    else:
+        try:
+            d = email.utils.parsedate_to_datetime(s)
+        except (TypeError, ValueError):
+            pass
+    if d is None:
+        return _parse_ts_slow(s)
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=tz.UTC)
+    return int(d.timestamp())
+
+
+def _ts_date(ts: int) -> dt.date:
+    return dt.datetime.fromtimestamp(ts, tz=tz.UTC).date()
+
+
+def make_session(pool_size: int = 10, timed: bool = False) -> requests.Session:
+    """One keep-alive session shared by every fetch in a run; `timed` records connect times for tracing."""
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    adapter = (TimingAdapter if timed else HTTPAdapter)(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _from_cache(entry: dict, limit: int) -> list[Item]:
+    names = {f.name for f in fields(Item)}
+    items = [Item(**{k: v for k, v in d.items() if k in names}) for d in entry["items"]][:limit]
+    for it in items:
+        if it.published_ts is None:
+            it.published_ts = parse_ts(it.published)
+    return items
+
+
+def _conditional_get(
+    url: str, limit: int, timeout: float, session: Optional[requests.Session], cache: Optional[FeedCache]
+) -> tuple[Optional[requests.Response], Optional[list[Item]]]:
+    """GET `url`; returns (response, None), or (None, cached items) on a 304 or a stale-while-error hit."""
+    entry = cache.get(url) if cache else None
+    headers = {"User-Agent": USER_AGENT}
+    if entry:
+        headers.update(cache.validators(entry, limit))
+    rec = current()
+    try:
+        if rec is None:
+            r = (session or requests).get(url, headers=headers, timeout=timeout)
+        else:
+            r = timed_get(session or requests, url, headers, timeout, rec)
+        if r.status_code == 304 and entry:
+            cache.touch(url, entry)
+            if rec is not None:
+                rec["cache"] = "revalidated"
+            return None, _from_cache(entry, limit)
+        r.raise_for_status()
+        return r, None
+    except requests.RequestException:
+        stale = cache.stale(url) if cache else None
+        if stale is None:
+            raise
+        if rec is not None:
+            rec["cache"] = "stale"
+        return None, _from_cache(stale, limit)
+
+
+def fetch_rss(
+    url: str,
+    source: str,
+    limit: int,
+    timeout: int = 20,
+    session: Optional[requests.Session] = None,
+    cache: Optional[FeedCache] = None,
+) -> list[Item]:
     # feedparser can fetch itself, but we want to set UA consistently.
-    r = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=timeout)
-    r.raise_for_status()
+    r, cached = _conditional_get(url, limit, timeout, session, cache)
+    if cached is not None:
+        return cached
+    rec = current()
+    t0 = time.perf_counter() if rec is not None else 0.0
     feed = feedparser.parse(r.text)
     out: list[Item] = []
     for e in feed.entries[:limit]:
         title = _clean(getattr(e, "title", ""))
         link = getattr(e, "link", "") or ""
         published = getattr(e, "published", None) or getattr(e, "updated", None)
+        target = None
+        if is_reddit(link):
+            content = getattr(e, "content", None)
+            target = reddit_link_target(content[0].get("value", "") if content else getattr(e, "summary", ""))
         if title and link:
-            out.append(Item(source=source, title=title, url=link, published=published))
+            out.append(
+                Item(
+                    source=source,
+                    title=title,
+                    url=link,
+                    published=published,
+                    published_ts=parse_ts(published),
+                    target_url=target,
+                )
+            )
+    if rec is not None:
+        rec["parse_s"] = round(time.perf_counter() - t0, 6)
+    if cache:
+        cache.put(url, r.headers, limit, [asdict(it) for it in out], truncated=len(feed.entries) > limit)
     return out
 
 
-def fetch_hn_algolia(url: str, limit: int, timeout: int = 20) -> list[Item]:
-    r = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=timeout)
-    r.raise_for_status()
+def fetch_hn_algolia(
+    url: str,
+    source: str,
+    limit: int,
+    timeout: int = 20,
+    session: Optional[requests.Session] = None,
+    cache: Optional[FeedCache] = None,
+) -> list[Item]:
+    r, cached = _conditional_get(url, limit, timeout, session, cache)
+    if cached is not None:
+        return cached
+    rec = current()
+    t0 = time.perf_counter() if rec is not None else 0.0
     data = r.json()
     hits = data.get("hits", [])
     out: list[Item] = []
@@ -84,212 +253,625 @@ def fetch_hn_algolia(url: str, limit: int, timeout: int = 20) -> list[Item]:
         points = h.get("points")
         created_at = h.get("created_at")
         if title and link:
-            out.append(Item(source="Hacker News (Algolia: llm)", title=title, url=link, published=created_at, score=points))
+            out.append(
+                Item(
+                    source=source,
+                    title=title,
+                    url=link,
+                    published=created_at,
+                    score=points,
+                    published_ts=parse_ts(created_at),
+                )
+            )
     # Prefer higher points if present, otherwise keep order.
     out.sort(key=lambda x: (x.score is None, -(x.score or 0)))
+    if rec is not None:
+        rec["parse_s"] = round(time.perf_counter() - t0, 6)
+    if cache:
+        cache.put(url, r.headers, limit, [asdict(it) for it in out[:limit]], truncated=len(out) > limit)
     return out[:limit]
 
 
+def _failed(src: Source, e: BaseException) -> list[Item]:
+    return [Item(source=src.name, title=f"(fetch failed: {type(e).__name__}: {e})", url=src.url)]
+
+
+def _is_placeholder(it: Item) -> bool:
+    return it.title.startswith("(fetch failed")
+
+
+def fetch_source(
+    src: Source,
+    limit: int,
+    timeout: float = 20,
+    session: Optional[requests.Session] = None,
+    cache: Optional[FeedCache] = None,
+    scheduler: Optional[HostScheduler] = None,
+) -> list[Item]:
+    with scheduler.slot(src.url) if scheduler else nullcontext():
+        if src.kind == "hn":
+            return fetch_hn_algolia(src.url, src.name, limit, timeout=timeout, session=session, cache=cache)
+        return fetch_rss(src.url, src.name, limit, timeout=timeout, session=session, cache=cache)
+
+
+@dataclass
+class FetchStat:
+    name: str
+    ok: bool
+    seconds: Optional[float]  # None if the source never got a slot before the budget ran out
+    items: int
+    error: Optional[str] = None
+
+
+def fetch_all(
+    sources: list[Source],
+    limit: int,
+    session: Optional[requests.Session] = None,
+    budget: float = 30.0,
+    source_timeout: float = 20.0,
+    cache: Optional[FeedCache] = None,
+    scheduler: Optional[HostScheduler] = None,
+    max_workers: int = 32,
+    stats: Optional[list[FetchStat]] = None,
+    trace=NULL_TRACE,
+) -> list[tuple[str, list[Item]]]:
+    """Fetch every source in parallel and return groups in source order.
+
+    Sources wait in one queue per host and are handed to the pool only when
+    their host has a free slot and its rate allows a request, so a busy host
+    never ties up threads that idle hosts could use. Each source gets at most
+    `source_timeout` seconds once it starts and the whole stage at most
+    `budget` seconds;
+    anything failed or still running by then becomes a "(fetch failed ...)"
+    placeholder instead of holding up the digest. Per-source outcomes are
+    appended to `stats` if given, and I/O timings recorded in `trace`.
+    """
+    if not sources:
+        return []
+    session = session or make_session(min(len(sources), max_workers), timed=trace.enabled)
+    scheduler = scheduler or HostScheduler()
+    started: dict[int, float] = {}
+    finished: dict[int, float] = {}
+
+    def run(i: int, src: Source) -> list[Item]:
+        # The dispatcher already took this source's host slot.
+        try:
+            with trace.source(src.name):
+                started[i] = time.monotonic()
+                try:
+                    return fetch_source(src, limit, source_timeout, session, cache)
+                finally:
+                    finished[i] = time.monotonic()
+        finally:
+            scheduler.release(src.url)
+
+    t0 = time.monotonic()
+    workers = max(1, min(len(sources), max_workers))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="radar-fetch")
+    # One FIFO per host. A source goes to the pool only once its host has a free slot and
+    # its rate allows a request, so pool threads never sit waiting on a busy host while
+    # sources on idle hosts queue behind them.
+    queues: dict[str, deque] = {}
+    for i, src in enumerate(sources):
+        queues.setdefault(scheduler.key(src.url), deque()).append(i)
+    futures: dict[int, Future] = {}
+    index: dict[Future, int] = {}
+    pending: set = set()
+    late: set = set()
+    while queues or pending:
+        now = time.monotonic()
+        if now - t0 >= budget:
+            break
+        # Round-robin across hosts, one source per host per pass, while pool threads are free.
+        next_token = t0 + budget
+        busy = sum(1 for f in futures.values() if not f.done())
+        progress = True
+        while progress and busy < workers:
+            progress = False
+            for key in list(queues):
+                if busy >= workers:
+                    break
+                q = queues[key]
+                delay = scheduler.try_acquire(sources[q[0]].url)
+                if delay:
+                    if delay != math.inf:
+                        next_token = min(next_token, now + delay)
+                    continue
+                i = q.popleft()
+                if not q:
+                    del queues[key]
+                fut = pool.submit(run, i, sources[i])
+                futures[i] = fut
+                index[fut] = i
+                pending.add(fut)
+                busy += 1
+                progress = True
+        for fut in list(pending):
+            i = index[fut]
+            if i in started and now - started[i] >= source_timeout:
+                pending.discard(fut)
+                late.add(fut)
+        if not pending and not queues:
+            break
+        next_check = min([next_token] + [started[index[f]] + source_timeout for f in pending if index[f] in started])
+        timeout = max(0.01, min(next_check - now, 0.5))
+        if pending:
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            pending -= done
+        else:
+            time.sleep(timeout)  # only rate-limited or slot-starved hosts left
+    # Don't block on stragglers; their sockets still time out on their own.
+    pool.shutdown(wait=False, cancel_futures=True)
+    for i, fut in futures.items():
+        if fut.cancelled():  # never ran, so never released its slot
+            scheduler.release(sources[i].url)
+
+    groups: list = []
+    for i, src in enumerate(sources):
+        fut = futures.get(i)
+        error: Optional[BaseException] = None
+        if fut is None or fut in late or not fut.done():
+            if fut is not None:
+                fut.cancel()
+            limit_s = source_timeout if fut in late else budget
+            error = TimeoutError(f"no response within {limit_s:g}s")
+            items = _failed(src, error)
+        elif fut.exception() is not None:
+            error = fut.exception()
+            items = _failed(src, error)
+        else:
+            items = fut.result()
+            trace.count(src.name, "items_fetched", len(items))
+        if stats is not None:
+            end = finished.get(i, time.monotonic())
+            seconds = round(end - started[i], 3) if i in started else None
+            err = f"{type(error).__name__}: {error}" if error is not None else None
+            stats.append(FetchStat(src.name, error is None, seconds, 0 if error is not None else len(items), err))
+        groups.append((src.name, items))
+    return groups
+
+
 def now_utc_date() -> dt.date:
     return dt.datetime.now(tz=tz.UTC).date()
 
 
-def render_md(day: dt.date, groups: list, format_mode: str = "markdown") -> str:
-    if format_mode == "discord":
-        return render_discord(day, groups)
-    elif format_mode == "slack":
-        return render_slack(day, groups)
-    # Default: markdown
-    lines: list = []
-    lines.append(f"# AI Signal Radar — {day.isoformat()}")
-    lines.append("")
-    lines.append("Sources: Hugging Face blog, arXiv cs.AI RSS, r/LocalLLaMA RSS, r/MachineLearning RSS, HN Algolia query.")
-    lines.append("")
+def iter_markdown(day: dt.date, groups: list) -> Iterator[str]:
+    """Yield the markdown digest line by line."""
+    yield f"# AI Signal Radar — {day.isoformat()}"
+    yield ""
+    yield "Sources: " + ", ".join(group for group, _ in groups if group != TOP_GROUP) + "."
+    yield ""
 
     for (group, items) in groups:
-        lines.append(f"## {group}")
+        yield f"## {group}"
         if not items:
-            lines.append("- (no items fetched)")
-            lines.append("")
+            yield "- (no items fetched)"
+            yield ""
             continue
         for it in items:
             meta = []
             if it.score is not None:
                 meta.append(f"{it.score} points")
-            if it.published:
-                try:
-                    meta.append(dateparser.parse(str(it.published)).date().isoformat())
-                except Exception:  # noqa: BLE001
-                    meta.append(_clean(str(it.published))[:32])
+            if it.published_ts is not None:
+                meta.append(_ts_date(it.published_ts).isoformat())
+            elif it.published:
+                meta.append(_clean(str(it.published))[:32])
+            if it.also:
+                meta.append("also: " + ", ".join(it.also))
             meta_s = f" ({', '.join(meta)})" if meta else ""
-            lines.append(f"- [{it.title}]({it.url}){meta_s}")
-        lines.append("")
+            yield f"- [{it.title}]({it.url}){meta_s}"
+        yield ""
 
-    lines.append("## 3 quick follow-ups (auto-generated heuristics)")
-    lines.append("- Skim HF blog post titles for tooling you can *ship* this week (agents, evals, runtimes).")
-    lines.append("- Pull 1 arXiv paper that suggests a measurable technique; write a minimal reproduction script.")
-    lines.append("- From r/LocalLLaMA + HN: identify 1 recurring pain point; build a tiny CLI to reduce it.")
-    lines.append("")
-    return "\n".join(lines)
+    yield "## 3 quick follow-ups (auto-generated heuristics)"
+    yield "- Skim HF blog post titles for tooling you can *ship* this week (agents, evals, runtimes)."
+    yield "- Pull 1 arXiv paper that suggests a measurable technique; write a minimal reproduction script."
+    yield "- From r/LocalLLaMA + HN: identify 1 recurring pain point; build a tiny CLI to reduce it."
+    yield ""
 
 
-def render_discord(day: dt.date, groups: list) -> str:
-    """Render a compact Discord-friendly format."""
-    lines: list = []
-    lines.append(f"**📡 AI Signal Radar — {day.isoformat()}**")
-    lines.append("")
+def iter_discord(day: dt.date, groups: list) -> Iterator[str]:
+    """Yield a compact Discord-friendly format line by line."""
+    yield f"**📡 AI Signal Radar — {day.isoformat()}**"
+    yield ""
 
     for (group, items) in groups:
         if not items:
             continue
-        lines.append(f"**{group}**")
+        yield f"**{group}**"
         for it in items[:5]:  # Limit to top 5 per source for Discord
             meta = []
             if it.score is not None:
                 meta.append(f"⬆{it.score}")
-            if it.published:
-                try:
-                    meta.append(dateparser.parse(str(it.published)).date().isoformat()[-5:])
-                except Exception:  # noqa: BLE001
-                    pass
+            if it.published_ts is not None:
+                meta.append(_ts_date(it.published_ts).isoformat()[-5:])
+            if it.also:
+                meta.append(f"+{len(it.also)} src")
             meta_s = f" {', '.join(meta)}" if meta else ""
             # Truncate long titles
             title = it.title[:80] + "..." if len(it.title) > 80 else it.title
-            lines.append(f"• {title}{meta_s}")
-        lines.append("")
-    return "\n".join(lines)
+            yield f"• {title}{meta_s}"
+        yield ""
 
 
-def render_slack(day: dt.date, groups: list) -> str:
-    """Render a Slack-friendly format with emojis."""
-    lines: list = []
-    lines.append(f"📡 *AI Signal Radar — {day.isoformat()}*")
-    lines.append("")
+def iter_slack(day: dt.date, groups: list) -> Iterator[str]:
+    """Yield a Slack-friendly format with emojis line by line."""
+    yield f"📡 *AI Signal Radar — {day.isoformat()}*"
+    yield ""
 
     for (group, items) in groups:
         if not items:
             continue
-        lines.append(f"*{group}*")
+        yield f"*{group}*"
         for it in items[:5]:
             meta = []
             if it.score is not None:
                 meta.append(f"⬆{it.score}")
+            if it.also:
+                meta.append("also: " + ", ".join(it.also))
             meta_s = f" ({', '.join(meta)})" if meta else ""
             title = it.title[:80] + "..." if len(it.title) > 80 else it.title
-            lines.append(f"• <{it.url}|{title}>{meta_s}")
-        lines.append("")
-    return "\n".join(lines)
+            yield f"• <{it.url}|{title}>{meta_s}"
+        yield ""
+
+
+RENDERERS = {"markdown": iter_markdown, "discord": iter_discord, "slack": iter_slack}
+EXTENSIONS = {"markdown": ".md", "discord": ".txt", "slack": ".txt"}
 
 
-def write_digest(out_dir: str, day: dt.date, md: str, fmt: str = "markdown") -> str:
+def render_md(day: dt.date, groups: list, format_mode: str = "markdown") -> str:
+    return "\n".join(RENDERERS.get(format_mode, iter_markdown)(day, groups))
+
+
+def render_discord(day: dt.date, groups: list) -> str:
+    """Render a compact Discord-friendly format."""
+    return "\n".join(iter_discord(day, groups))
+
+
+def render_slack(day: dt.date, groups: list) -> str:
+    """Render a Slack-friendly format with emojis."""
+    return "\n".join(iter_slack(day, groups))
+
+
+def digest_path(out_dir: str, day: dt.date, fmt: str = "markdown", formats: Iterable[str] = ()) -> str:
+    """Output path for `fmt`; the format name is added when another requested format shares its extension."""
+    ext = EXTENSIONS.get(fmt, ".md")
+    clash = any(f != fmt and EXTENSIONS.get(f, ".md") == ext for f in formats)
+    return os.path.join(out_dir, f"{day.isoformat()}{'.' + fmt if clash else ''}{ext}")
+
+
+def write_digest(
+    out_dir: str,
+    day: dt.date,
+    md: Union[str, Iterable[str]],
+    fmt: str = "markdown",
+    formats: Iterable[str] = (),
+    echo: Optional[TextIO] = None,
+) -> str:
+    """Write a rendered digest (a string, or lines streamed from a renderer), optionally teeing to `echo`."""
     os.makedirs(out_dir, exist_ok=True)
-    ext = ".txt" if fmt in ("discord", "slack") else ".md"
-    path = os.path.join(out_dir, f"{day.isoformat()}{ext}")
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(md)
+    path = digest_path(out_dir, day, fmt, formats)
+    chunks = [md] if isinstance(md, str) else _joined(md)
+    # Write beside the target and rename, so readers never see a half-written digest.
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            if echo is not None:
+                echo.write(chunk)
+    os.replace(tmp, path)
+    if echo is not None:
+        echo.write("\n")
     return path
 
 
+def _joined(lines: Iterable[str]) -> Iterator[str]:
+    # Same output as "\n".join(lines) without materializing it.
+    first = True
+    for line in lines:
+        yield line if first else "\n" + line
+        first = False
+
+
+def item_to_dict(it: Item) -> dict:
+    return {
+        "source": it.source,
+        "title": it.title,
+        "url": it.url,
+        "published": it.published,
+        "score": it.score,
+        "matched": it.matched,
+        "published_ts": it.published_ts,
+        "target_url": it.target_url,
+        "also": it.also,
+        "rank": None if it.rank is None else round(it.rank, 4),
+    }
+
+
+def load_dump(path: str) -> tuple[dt.date, list]:
+    """Rebuild (day, groups) from a `--json` dump, with no network access."""
+    with open(path, encoding="utf-8") as f:
+        dump = json.load(f)
+    names = {f.name for f in fields(Item)}
+    groups = []
+    for g in dump.get("groups", []):
+        items = []
+        for d in g.get("items", []):
+            it = Item(**{k: v for k, v in d.items() if k in names})
+            if it.published_ts is None:
+                it.published_ts = parse_ts(it.published)
+            items.append(it)
+        groups.append((g.get("name", ""), items))
+    return dt.date.fromisoformat(dump["date"]), groups
+
+
 def main(argv: Optional[list[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["search"]:
+        # Imported lazily so a plain digest run doesn't pay for it.
+        from . import search
+
+        return search.main(argv[1:])
+
     ap = argparse.ArgumentParser(description="Generate a small daily AI/LLM signal digest.")
-    ap.add_argument("--limit", type=int, default=8, help="items per source")
+    ap.add_argument("--limit", type=int, default=8, help="items per source in the digest")
+    ap.add_argument("--fetch-limit", type=int, help="items to fetch per source before ranking (default: --limit)")
+    ap.add_argument("--top", type=int, default=0, help="also add a 'Top signals' section with the best N items across sources")
+    ap.add_argument("--no-rank", action="store_true", help="keep feed order instead of ranking items")
     ap.add_argument("--out", type=str, default=os.path.join(os.path.dirname(__file__), "..", "out"), help="output directory")
     ap.add_argument("--json", dest="write_json", action="store_true", help="also write a JSON dump")
-    ap.add_argument("--format", type=str, choices=["markdown", "discord", "slack"], default="markdown", help="output format")
+    ap.add_argument("--format", type=str, default="markdown", help="output format(s), comma-separated: markdown, discord, slack, json")
+    ap.add_argument("--from-json", type=str, help="re-render a previous JSON dump instead of fetching (no network)")
     ap.add_argument("--since", type=str, help="only include items published after this date (YYYY-MM-DD)")
-    ap.add_argument("--keywords", type=str, help="comma-separated keywords to filter (default: built-in AI/LLM keywords)")
+    ap.add_argument("--keywords", type=str, help="comma-separated keywords to filter (default: built-in AI/LLM keywords); =word for whole words, pre* for word prefixes, kw:2 to weight")
     ap.add_argument("--include-all", action="store_true", help="include all items but prioritize keyword matches")
+    ap.add_argument("--sources", type=str, help="JSON source registry (default: sources.json next to src/, else built-in sources)")
+    ap.add_argument("--max-workers", type=int, default=32, help="fetch threads across all hosts")
+    ap.add_argument("--budget", type=float, default=30.0, help="wall-clock seconds for the whole fetch stage")
+    ap.add_argument("--source-timeout", type=float, default=20.0, help="seconds each source may take before it is dropped")
+    ap.add_argument("--no-cache", action="store_true", help="don't use the conditional-GET feed cache under --out/.cache")
+    ap.add_argument("--cache-max-age", type=float, default=0, help="serve a cached copy up to this many seconds old when a source fails")
+    ap.add_argument("--no-dedup", action="store_true", help="don't merge the same story across sources")
+    ap.add_argument("--new-only", action="store_true", help="only include items not reported by a previous --new-only run")
+    ap.add_argument("--seen-max-age", type=float, default=30, help="days to remember reported items for --new-only")
+    ap.add_argument("--trace", action="store_true", help="record per-source I/O and per-stage timings into the JSON dump")
+    ap.add_argument("--trace-jsonl", type=str, help="append trace records to this JSONL file (implies --trace)")
+    ap.add_argument("--prom-textfile", type=str, help="write trace metrics as a Prometheus textfile (implies --trace)")
+    ap.add_argument("--daemon", action="store_true", help="keep running, polling each source on its own interval")
+    ap.add_argument("--write-every", type=float, default=300.0, help="in --daemon mode, seconds between digest rewrites")
     args = ap.parse_args(argv)
 
+    formats = [f.strip() for f in args.format.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in RENDERERS and f != "json"]
+    if unknown or not formats:
+        ap.error(f"unknown format(s) in --format {args.format!r}")
+    if args.top > 0 and args.no_rank:
+        ap.error("--top needs ranking; drop --no-rank")
+    write_json = args.write_json or "json" in formats
+    formats = [f for f in formats if f != "json"] or ["markdown"]
+
+    if args.from_json:
+        day, filtered_groups = load_dump(args.from_json)
+        _emit(os.path.abspath(args.out), day, filtered_groups, formats)
+        return 0
+
     # Parse keywords
     keywords = DEFAULT_KEYWORDS
     if args.keywords:
         keywords = [k.strip() for k in args.keywords.split(",") if k.strip()]
+    matcher = KeywordMatcher(keywords)
 
     # Parse since date
-    since_date: Optional[dt.date] = None
+    since_ts: Optional[int] = None
     if args.since:
-        since_date = dt.date.fromisoformat(args.since)
+        since_ts = int(dt.datetime.combine(dt.date.fromisoformat(args.since), dt.time(), tzinfo=tz.UTC).timestamp())
+
+    sources, host_limits = SOURCES, None
+    sources_path = args.sources or (DEFAULT_SOURCES_PATH if os.path.exists(DEFAULT_SOURCES_PATH) else None)
+    if sources_path:
+        sources, host_limits = load_sources(sources_path)
+    scheduler = HostScheduler(host_limits)
+
+    out_dir = os.path.abspath(args.out)
+    fetch_limit = max(args.fetch_limit or 0, args.limit)
+
+    cache: Optional[FeedCache] = None
+    if not args.no_cache:
+        cache = FeedCache(os.path.join(out_dir, ".cache"), max_stale=args.cache_max_age)
+
+    if args.daemon:
+        return _run_daemon(args, sources, scheduler, out_dir, fetch_limit, cache, matcher, since_ts, formats, write_json, keywords)
+
+    trace = Trace() if (args.trace or args.trace_jsonl or args.prom_textfile) else NULL_TRACE
+    stats: list[FetchStat] = []
+    t0 = time.monotonic()
+    with trace.stage("fetch"):
+        groups = fetch_all(
+            sources,
+            fetch_limit,
+            budget=args.budget,
+            source_timeout=args.source_timeout,
+            cache=cache,
+            scheduler=scheduler,
+            max_workers=args.max_workers,
+            stats=stats,
+            trace=trace,
+        )
+    fetch_seconds = time.monotonic() - t0
+    if cache:
+        cache.prune()
 
     day = now_utc_date()
+    filtered_groups = process_groups(groups, args, matcher, since_ts, sources, trace)
+    out_paths = _publish(out_dir, day, filtered_groups, formats, write_json, keywords, args.since, fetch=stats, trace=trace)
+    if args.trace_jsonl:
+        trace.write_jsonl(args.trace_jsonl)
+    if args.prom_textfile:
+        trace.write_prometheus(args.prom_textfile)
+    failed = [st for st in stats if not st.ok]
+    slowest = max((st for st in stats if st.seconds is not None), key=lambda st: st.seconds, default=None)
+    print(
+        f"\n[Fetched {len(stats) - len(failed)}/{len(stats)} sources in {fetch_seconds:.1f}s"
+        + (f"; slowest {slowest.name} {slowest.seconds:.1f}s" if slowest else "")
+        + (f"; failed: {', '.join(st.name for st in failed)}" if failed else "")
+        + "]",
+        file=sys.stderr,
+    )
+    print(f"[Written to: {', '.join(out_paths)}]", file=sys.stderr)
+    return 0
 
-    groups: list = []
-    groups.append(("Hugging Face — Blog", fetch_rss(HF_BLOG_RSS, "Hugging Face — Blog", args.limit)))
-
-    # arXiv rss export sometimes has no entries on weekends (skipDays).
-    groups.append(("arXiv — cs.AI", fetch_rss(ARXIV_CSAI_RSS, "arXiv — cs.AI", args.limit)))
-
-    # Reddit RSS is rate-limited occasionally.
-    try:
-        groups.append(("Reddit — r/LocalLLaMA", fetch_rss(LOCAL_LLAMMA_RSS, "Reddit — r/LocalLLaMA", args.limit)))
-    except Exception as e:  # noqa: BLE001
-        groups.append(("Reddit — r/LocalLLaMA", [Item(source="Reddit — r/LocalLLaMA", title=f"(fetch failed: {type(e).__name__}: {e})", url=LOCAL_LLAMMA_RSS)]))
-
-    # Added r/MachineLearning RSS
-    try:
-        groups.append(("Reddit — r/MachineLearning", fetch_rss(MACHINE_LEARNING_RSS, "Reddit — r/MachineLearning", args.limit)))
-    except Exception as e:  # noqa: BLE001
-        groups.append(("Reddit — r/MachineLearning", [Item(source="Reddit — r/MachineLearning", title=f"(fetch failed: {type(e).__name__}: {e})", url=MACHINE_LEARNING_RSS)]))
 
-    groups.append(("Hacker News", fetch_hn_algolia(HN_ALGOLIA_LLM, args.limit)))
+def process_groups(
+    groups: list,
+    args: argparse.Namespace,
+    matcher: KeywordMatcher,
+    since_ts: Optional[int],
+    sources: Optional[list[Source]] = None,
+    trace=NULL_TRACE,
+) -> list:
+    """Dedupe, drop already-reported items, filter and rank fetched groups according to the CLI options."""
+    if not args.no_dedup:
+        with trace.stage("dedup"):
+            groups = dedupe(groups)
+
+    store: Optional[SeenStore] = None
+    if args.new_only:
+        with trace.stage("new_only"):
+            os.makedirs(os.path.abspath(args.out), exist_ok=True)
+            store = SeenStore(os.path.join(os.path.abspath(args.out), "seen.sqlite3"))
+            store.prune(args.seen_max_age * 86400)
+            groups = [
+                (name, [it for it in items if _is_placeholder(it)] + store.filter_new(it for it in items if not _is_placeholder(it)))
+                for name, items in groups
+            ]
 
     # Apply keyword filtering
     filtered_groups: list = []
-    for name, items in groups:
-        filtered = filter_by_keywords(items, keywords, args.include_all)
-        # Apply date filter
-        if since_date:
-            date_filtered = []
-            for it in filtered:
-                if it.published:
-                    try:
-                        item_date = dateparser.parse(str(it.published)).date()
-                        if item_date >= since_date:
-                            date_filtered.append(it)
-                    except Exception:
-                        date_filtered.append(it)  # Keep if we can't parse
-                else:
-                    date_filtered.append(it)  # Keep if no date
-            filtered_groups.append((name, date_filtered))
-        else:
+    with trace.stage("filter"):
+        for name, items in groups:
+            filtered = filter_by_keywords(items, matcher, args.include_all)
+            # Apply date filter
+            if since_ts is not None:
+                filtered = filter_since(filtered, since_ts)
             filtered_groups.append((name, filtered))
 
-    # Render in requested format
-    md = render_md(day, filtered_groups, args.format)
-    
-    # Write output
-    out_path = write_digest(os.path.abspath(args.out), day, md, args.format)
-
-    if args.write_json:
+    with trace.stage("rank"):
+        if not args.no_rank:
+            ranker = Ranker(matcher)
+            priors = {src.name: src.prior for src in (sources or SOURCES)}
+            # Placeholders for failed fetches stay in their section but get no rank, so
+            # they never compete for a source's limit or the cross-source top.
+            filtered_groups = [
+                (
+                    name,
+                    [it for it in items if _is_placeholder(it)]
+                    + ranker.top(
+                        (it for it in items if not _is_placeholder(it)),
+                        args.limit,
+                        priors.get(name, 1.0),
+                        matches_first=args.include_all,
+                    ),
+                )
+                for name, items in filtered_groups
+            ]
+            if args.top > 0:
+                filtered_groups.insert(0, (TOP_GROUP, top_ranked(filtered_groups, args.top)))
+        else:
+            filtered_groups = [(name, items[: args.limit]) for name, items in filtered_groups]
+
+    if trace.enabled:
+        for name, items in filtered_groups:
+            if name != TOP_GROUP:
+                trace.count(name, "items_kept", sum(1 for it in items if not _is_placeholder(it)))
+    if store:
+        store.mark(it for _, items in filtered_groups for it in items if not _is_placeholder(it))
+        store.close()
+    return filtered_groups
+
+
+def _publish(
+    out_dir: str,
+    day: dt.date,
+    filtered_groups: list,
+    formats: list[str],
+    write_json: bool,
+    keywords: list[str],
+    since: Optional[str],
+    echo: bool = True,
+    fetch: Optional[list[FetchStat]] = None,
+    trace=NULL_TRACE,
+) -> list[str]:
+    out_paths = _emit(out_dir, day, filtered_groups, formats, echo=echo, trace=trace)
+
+    if write_json:
         dump = {
             "date": day.isoformat(),
-            "format": args.format,
+            "format": formats[0],
+            "formats": formats,
             "keywords": keywords,
-            "since": args.since,
-            "groups": [
-                {
-                    "name": name,
-                    "items": [
-                        {
-                            "source": it.source,
-                            "title": it.title,
-                            "url": it.url,
-                            "published": it.published,
-                            "score": it.score,
-                        }
-                        for it in items
-                    ],
-                }
-                for (name, items) in filtered_groups
-            ],
+            "since": since,
+            "groups": [{"name": name, "items": [item_to_dict(it) for it in items]} for (name, items) in filtered_groups],
         }
-        json_path = os.path.splitext(out_path)[0] + ".json"
-        with open(json_path, "w", encoding="utf-8") as f:
+        if fetch is not None:
+            dump["fetch"] = [asdict(st) for st in fetch]
+        if trace.enabled:
+            dump["trace"] = trace.to_dict()
+        json_path = os.path.join(out_dir, f"{day.isoformat()}.json")
+        with open(json_path + ".tmp", "w", encoding="utf-8") as f:
             json.dump(dump, f, indent=2)
-
-    # Print to stdout for piping
-    print(md)
-    print(f"\n[Written to: {out_path}]", file=sys.stderr)
+        os.replace(json_path + ".tmp", json_path)
+        out_paths.append(json_path)
+    return out_paths
+
+
+def _emit(out_dir: str, day: dt.date, groups: list, formats: list[str], echo: bool = True, trace=NULL_TRACE) -> list[str]:
+    """Render every requested format from the same groups; the first also goes to stdout for piping."""
+    paths = []
+    for i, fmt in enumerate(formats):
+        # Rendering streams into the file, so this stage covers render + write.
+        with trace.stage(f"render.{fmt}"):
+            lines = RENDERERS[fmt](day, groups)
+            paths.append(write_digest(out_dir, day, lines, fmt, formats, echo=sys.stdout if echo and i == 0 else None))
+    return paths
+
+
+def _run_daemon(
+    args: argparse.Namespace,
+    sources: list[Source],
+    scheduler: HostScheduler,
+    out_dir: str,
+    fetch_limit: int,
+    cache: Optional[FeedCache],
+    matcher: KeywordMatcher,
+    since_ts: Optional[int],
+    formats: list[str],
+    write_json: bool,
+    keywords: list[str],
+) -> int:
+    # Imported lazily so one-shot runs don't pay for it.
+    from .daemon import RadarDaemon
+
+    session = make_session(min(len(sources), args.max_workers))
+
+    def publish(groups: list) -> None:
+        if cache:
+            cache.prune()
+        paths = _publish(out_dir, now_utc_date(), process_groups(groups, args, matcher, since_ts, sources), formats, write_json, keywords, args.since, echo=False)
+        print(f"[radar] wrote {', '.join(paths)}", file=sys.stderr)
+
+    daemon = RadarDaemon(
+        sources,
+        fetch=lambda src: fetch_source(src, fetch_limit, args.source_timeout, session, cache, scheduler),
+        publish=publish,
+        placeholder=_failed,
+        write_every=args.write_every,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.close()
     return 0
 
 
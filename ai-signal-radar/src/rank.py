@@ -0,0 +1,62 @@
+"""Relevance ranking for radar items.
+
+An item's rank is its source prior times a weighted sum of keyword weight,
+recency (exponential decay on `published_ts`) and engagement (points and how
+many sources carried it). Top-k selection uses a heap, so fetching hundreds of
+items per source costs O(n log k) rather than a full sort.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from .keywords import KeywordMatcher
+
+
+@dataclass
+class RankWeights:
+    keyword: float = 1.0
+    recency: float = 1.0
+    engagement: float = 1.0
+    half_life_hours: float = 48.0
+
+
+class Ranker:
+    def __init__(self, matcher: Optional[KeywordMatcher] = None, weights: Optional[RankWeights] = None, now: Optional[float] = None):
+        self.matcher = matcher
+        self.weights = weights or RankWeights()
+        self.now = time.time() if now is None else now
+
+    def score(self, it, prior: float = 1.0) -> float:
+        w = self.weights
+        kw = self.matcher.weight(it.matched) if self.matcher else 0.0
+        recency = 0.0
+        if it.published_ts is not None:
+            age_h = max(0.0, self.now - it.published_ts) / 3600
+            recency = 0.5 ** (age_h / w.half_life_hours)
+        # log scale so a 2000-point HN story doesn't drown everything else out
+        engagement = math.log1p(max(it.score or 0, 0)) / math.log1p(1000) + 0.5 * len(it.also)
+        return prior * (w.keyword * kw + w.recency * recency + w.engagement * engagement)
+
+    def top(self, items: Iterable, k: int, prior: float = 1.0, matches_first: bool = False) -> list:
+        """Score `items` (setting `item.rank`) and return the best `k`, best first."""
+        scored = []
+        for it in items:
+            it.rank = self.score(it, prior)
+            scored.append(it)
+        if matches_first:
+            return heapq.nlargest(k, scored, key=lambda it: (bool(it.matched), it.rank))
+        return heapq.nlargest(k, scored, key=lambda it: it.rank)
+
+
+# Name of the cross-source section added by --top.
+TOP_GROUP = "Top signals"
+
+
+def top_ranked(groups: list, k: int) -> list:
+    """Global top `k` of already-ranked items across all groups."""
+    return heapq.nlargest(k, (it for _, items in groups for it in items if it.rank is not None), key=lambda it: it.rank)
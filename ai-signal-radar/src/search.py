@@ -0,0 +1,186 @@
+"""Search over the archived `--json` dumps in the output directory.
+
+The index is a SQLite file under `<out>/.index/` holding one row per archived
+item plus a term -> item postings table. Each search first picks up dumps that
+are new or changed since the last call and forgets deleted ones, so daily runs
+never trigger a rebuild. The --top section only repeats items from the source
+sections, so it is not indexed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import re
+import sqlite3
+import sys
+from typing import Optional
+
+from .rank import TOP_GROUP
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_DUMP = re.compile(r"^\d{4}-\d{2}-\d{2}\.json$")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+class ArchiveIndex:
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        index_dir = os.path.join(out_dir, ".index")
+        os.makedirs(index_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(index_dir, "archive.sqlite3"))
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY, file TEXT NOT NULL, day TEXT NOT NULL, grp TEXT, source TEXT,
+                title TEXT, url TEXT, score INTEGER, published_ts INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS docs_file ON docs (file);
+            CREATE INDEX IF NOT EXISTS docs_day ON docs (day);
+            CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc INTEGER NOT NULL, PRIMARY KEY (term, doc)) WITHOUT ROWID;
+            """
+        )
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Indexes built before the top section was skipped hold every top item twice.
+            with self.conn:
+                self._drop_docs("grp = ?", (TOP_GROUP,))
+                self.conn.execute("PRAGMA user_version = 1")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def refresh(self) -> int:
+        """Index dumps that are new or changed since the last refresh; returns how many."""
+        known = {name: (mtime, size) for name, mtime, size in self.conn.execute("SELECT name, mtime, size FROM files")}
+        changed = []
+        with os.scandir(self.out_dir) as it:
+            for entry in it:
+                if not _DUMP.match(entry.name):
+                    continue
+                st = entry.stat()
+                if known.get(entry.name) != (st.st_mtime, st.st_size):
+                    changed.append((entry.name, st))
+                known.pop(entry.name, None)
+        if known:  # dumps deleted since they were indexed
+            with self.conn:
+                for name in known:
+                    self._drop_docs("file = ?", (name,))
+                    self.conn.execute("DELETE FROM files WHERE name = ?", (name,))
+        for name, st in sorted(changed):
+            self._ingest(name, st)
+        return len(changed)
+
+    def _drop_docs(self, where: str, params: tuple) -> None:
+        old = [row[0] for row in self.conn.execute(f"SELECT id FROM docs WHERE {where}", params)]
+        if old:
+            self.conn.executemany("DELETE FROM postings WHERE doc = ?", [(d,) for d in old])
+            self.conn.execute(f"DELETE FROM docs WHERE {where}", params)
+
+    def _ingest(self, name: str, st: os.stat_result) -> None:
+        try:
+            with open(os.path.join(self.out_dir, name), encoding="utf-8") as f:
+                dump = json.load(f)
+        except (OSError, ValueError):
+            return
+        day = dump.get("date") or name[:-5]
+        with self.conn:
+            self._drop_docs("file = ?", (name,))
+            for group in dump.get("groups", []):
+                if group.get("name") == TOP_GROUP:
+                    continue
+                for item in group.get("items", []):
+                    title = item.get("title") or ""
+                    if title.startswith("(fetch failed"):
+                        continue
+                    cur = self.conn.execute(
+                        "INSERT INTO docs (file, day, grp, source, title, url, score, published_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (name, day, group.get("name"), item.get("source"), title, item.get("url"), item.get("score"), item.get("published_ts")),
+                    )
+                    terms = set(tokenize(title)) | set(tokenize(item.get("source") or ""))
+                    self.conn.executemany("INSERT OR IGNORE INTO postings (term, doc) VALUES (?, ?)", [(t, cur.lastrowid) for t in terms])
+            self.conn.execute("INSERT OR REPLACE INTO files (name, mtime, size) VALUES (?, ?, ?)", (name, st.st_mtime, st.st_size))
+
+    def search(
+        self,
+        terms: list[str],
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        source: Optional[str] = None,
+        min_score: Optional[int] = None,
+        first: bool = False,
+        limit: int = 50,
+    ) -> list[dict]:
+        """Items matching every term (`term*` for prefixes), newest first or oldest first with `first`."""
+        where: list[str] = []
+        params: list = []
+        for term in terms:
+            toks = tokenize(term)
+            for i, tok in enumerate(toks):
+                if term.endswith("*") and i == len(toks) - 1:
+                    where.append("id IN (SELECT doc FROM postings WHERE term >= ? AND term < ?)")
+                    params += [tok, tok + "\uffff"]
+                else:
+                    where.append("id IN (SELECT doc FROM postings WHERE term = ?)")
+                    params.append(tok)
+        if since:
+            where.append("day >= ?")
+            params.append(since)
+        if until:
+            where.append("day <= ?")
+            params.append(until)
+        if source:
+            where.append("(source LIKE ? OR grp LIKE ?)")
+            params += [f"%{source}%", f"%{source}%"]
+        if min_score is not None:
+            where.append("score >= ?")
+            params.append(min_score)
+        q = "SELECT day, grp, source, title, url, score, published_ts FROM docs"
+        if where:
+            q += " WHERE " + " AND ".join(where)
+        q += f" ORDER BY day {'ASC' if first else 'DESC'}, id LIMIT ?"
+        params.append(limit)
+        cols = ("date", "group", "source", "title", "url", "score", "published_ts")
+        return [dict(zip(cols, row)) for row in self.conn.execute(q, params)]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="radar search", description="Search archived radar JSON dumps.")
+    ap.add_argument("terms", nargs="*", help="keywords that must all appear in the title or source (trailing * for prefix)")
+    ap.add_argument("--out", type=str, default=os.path.join(os.path.dirname(__file__), "..", "out"), help="output directory holding the dumps")
+    ap.add_argument("--since", type=str, help="earliest dump date (YYYY-MM-DD)")
+    ap.add_argument("--until", type=str, help="latest dump date (YYYY-MM-DD)")
+    ap.add_argument("--source", type=str, help="substring of the source or group name")
+    ap.add_argument("--min-score", type=int, help="minimum score/points")
+    ap.add_argument("--first", action="store_true", help="oldest first (when did X first show up?)")
+    ap.add_argument("--limit", type=int, default=50, help="maximum results")
+    ap.add_argument("--json", dest="as_json", action="store_true", help="print results as JSON")
+    args = ap.parse_args(argv)
+
+    for flag, d in (("--since", args.since), ("--until", args.until)):
+        if d:
+            try:
+                dt.date.fromisoformat(d)
+            except ValueError:
+                ap.error(f"{flag} must be a date (YYYY-MM-DD), not {d!r}")
+
+    index = ArchiveIndex(os.path.abspath(args.out))
+    try:
+        index.refresh()
+        hits = index.search(args.terms, args.since, args.until, args.source, args.min_score, args.first, args.limit)
+    finally:
+        index.close()
+
+    if args.as_json:
+        print(json.dumps(hits, indent=2))
+        return 0
+    for h in hits:
+        score = f" ({h['score']} points)" if h["score"] is not None else ""
+        print(f"{h['date']}  {h['group']}  {h['title']}{score}\n            {h['url']}")
+    print(f"[{len(hits)} result(s)]", file=sys.stderr)
+    return 0
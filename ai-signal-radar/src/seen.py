@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+from .urls import canonical_url
+
+# SQLite caps bound parameters per statement; stay well below it.
+_CHUNK = 500
+
+
+def fingerprint(source: str, url: str) -> str:
+    return hashlib.sha1(f"{source}\n{canonical_url(url)}".encode("utf-8")).hexdigest()
+
+
+class SeenStore:
+    """Fingerprints of items already reported, with first/last-seen times."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " fp TEXT PRIMARY KEY, source TEXT NOT NULL, url TEXT NOT NULL,"
+            " first_seen INTEGER NOT NULL, last_seen INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS seen_last_seen ON seen (last_seen)")
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _known(self, fps: list[str]) -> set[str]:
+        known: set[str] = set()
+        for i in range(0, len(fps), _CHUNK):
+            chunk = fps[i : i + _CHUNK]
+            q = f"SELECT fp FROM seen WHERE fp IN ({','.join('?' * len(chunk))})"
+            known.update(row[0] for row in self.conn.execute(q, chunk))
+        return known
+
+    def filter_new(self, items: Iterable, now: Optional[int] = None) -> list:
+        """Items never reported before; bumps last_seen on the ones that were."""
+        now = int(now or time.time())
+        items = list(items)
+        fps = [fingerprint(it.source, it.url) for it in items]
+        known = self._known(fps)
+        with self.conn:
+            self.conn.executemany("UPDATE seen SET last_seen = ? WHERE fp = ?", [(now, fp) for fp in known])
+        return [it for it, fp in zip(items, fps) if fp not in known]
+
+    def mark(self, items: Iterable, now: Optional[int] = None) -> None:
+        """Record items as reported."""
+        now = int(now or time.time())
+        rows = [(fingerprint(it.source, it.url), it.source, it.url, now, now) for it in items]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO seen (fp, source, url, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(fp) DO UPDATE SET last_seen = excluded.last_seen",
+                rows,
+            )
+
+    def prune(self, max_age: float, now: Optional[int] = None) -> int:
+        """Forget items not seen in the last `max_age` seconds."""
+        now = int(now or time.time())
+        with self.conn:
+            cur = self.conn.execute("DELETE FROM seen WHERE last_seen < ?", (now - int(max_age),))
+        return cur.rowcount
@@ -0,0 +1,177 @@
+"""Per-source and per-stage instrumentation for radar runs.
+
+A `Trace` collects one record per source (connect/TTFB/download time, bytes,
+status, parse time, item counts) plus wall time per pipeline stage. Fetch code
+finds the record for the source it is working on through a thread-local, so
+nothing has to be threaded through the fetch functions. With tracing off,
+`NULL_TRACE` hands out a shared no-op context and `current()` returns None,
+which is all the hot path pays.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_local = threading.local()
+
+
+def current() -> Optional[dict]:
+    """The trace record of the source being fetched on this thread, if tracing."""
+    return getattr(_local, "rec", None)
+
+
+class Trace:
+    enabled = True
+
+    def __init__(self):
+        self.started = time.time()
+        self.sources: dict[str, dict] = {}
+        self.stages: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str) -> dict:
+        with self._lock:
+            return self.sources.setdefault(name, {"source": name})
+
+    @contextmanager
+    def source(self, name: str) -> Iterator[dict]:
+        """Bind `name`'s record to this thread while its fetch runs."""
+        rec = self.record(name)
+        prev = getattr(_local, "rec", None)
+        _local.rec = rec
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["fetch_s"] = round(time.perf_counter() - t0, 6)
+            _local.rec = prev
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(self.stages.get(name, 0.0) + time.perf_counter() - t0, 6)
+
+    def count(self, name: str, key: str, n: int) -> None:
+        self.record(name)[key] = n
+
+    def to_dict(self) -> dict:
+        return {"started": self.started, "stages": dict(self.stages), "sources": list(self.sources.values())}
+
+    def write_jsonl(self, path: str) -> None:
+        """Append one line per source and one per stage, tagged with the run start time."""
+        with open(path, "a", encoding="utf-8") as f:
+            for rec in self.sources.values():
+                f.write(json.dumps({"run": self.started, "type": "source", **rec}) + "\n")
+            for name, seconds in self.stages.items():
+                f.write(json.dumps({"run": self.started, "type": "stage", "stage": name, "seconds": seconds}) + "\n")
+
+    def write_prometheus(self, path: str, prefix: str = "radar") -> None:
+        """Write a node_exporter textfile-collector file (atomically)."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time per pipeline stage in the last run.",
+            f"# TYPE {prefix}_stage_seconds gauge",
+        ]
+        lines += [f'{prefix}_stage_seconds{{stage="{_esc(k)}"}} {v}' for k, v in self.stages.items()]
+        metrics = {
+            "connect_s": ("source_connect_seconds", "DNS + TCP + TLS time for new connections."),
+            "ttfb_s": ("source_ttfb_seconds", "Time from request start to response headers."),
+            "download_s": ("source_download_seconds", "Time reading the response body."),
+            "parse_s": ("source_parse_seconds", "Time parsing the response into items."),
+            "fetch_s": ("source_fetch_seconds", "Total fetch time including waits for host slots."),
+            "bytes": ("source_response_bytes", "Response body size."),
+            "items_fetched": ("source_items_fetched", "Items parsed from the source."),
+            "items_kept": ("source_items_kept", "Items left after filtering and ranking."),
+        }
+        for key, (name, help_) in metrics.items():
+            lines += [f"# HELP {prefix}_{name} {help_}", f"# TYPE {prefix}_{name} gauge"]
+            for rec in self.sources.values():
+                if rec.get(key) is not None:
+                    lines.append(f'{prefix}_{name}{{source="{_esc(rec["source"])}"}} {rec[key]}')
+        lines += [f"# TYPE {prefix}_last_run_timestamp_seconds gauge", f"{prefix}_last_run_timestamp_seconds {self.started}"]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+
+class _NullTrace:
+    enabled = False
+    _noop = nullcontext()
+
+    def source(self, name: str):
+        return self._noop
+
+    def stage(self, name: str):
+        return self._noop
+
+    def count(self, name: str, key: str, n: int) -> None:
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def _esc(s: str) -> str:
+    return s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Connection classes that add their connect() time (DNS, TCP, TLS) to the
+# current thread's trace record; only mounted when tracing is on.
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            rec = current()
+            if rec is not None:
+                rec["connect_s"] = round(rec.get("connect_s", 0.0) + time.perf_counter() - t0, 6)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            rec = current()
+            if rec is not None:
+                rec["connect_s"] = round(rec.get("connect_s", 0.0) + time.perf_counter() - t0, 6)
+
+
+class _TimedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool, "https": _TimedHTTPSPool}
+
+
+def timed_get(session, url: str, headers: dict, timeout: float, rec: dict) -> requests.Response:
+    """GET with the body read eagerly, recording TTFB, download time, bytes and status in `rec`."""
+    t0 = time.perf_counter()
+    r = session.get(url, headers=headers, timeout=timeout, stream=True)
+    t1 = time.perf_counter()
+    body = r.content  # reads and releases the connection
+    t2 = time.perf_counter()
+    rec.update(ttfb_s=round(t1 - t0, 6), download_s=round(t2 - t1, 6), bytes=len(body), status=r.status_code)
+    return r
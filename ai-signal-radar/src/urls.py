@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from.
+TRACKING_PARAMS = {"ref", "ref_src", "ref_url", "fbclid", "gclid", "mc_cid", "mc_eid"}
+
+_ARXIV_ID = re.compile(r"^/(?:abs|pdf|html)/([a-z\-]+(?:\.[A-Z]{2})?/\d{7}|\d{4}\.\d{4,5})(?:v\d+)?(?:\.pdf)?$")
+_REDDIT_POST = re.compile(r"^(?:/r/[^/]+)?/comments/([a-z0-9]+)")
+_REDDIT_LINK = re.compile(r'<a href="([^"]+)">\[link\]</a>')
+
+
+def _on_domain(host: str, domain: str) -> bool:
+    # Exact host or a subdomain; a bare suffix match would also take notreddit.com.
+    return host == domain or host.endswith("." + domain)
+
+
+def is_reddit(url: str) -> bool:
+    """Whether `url` is on reddit.com or one of its subdomains."""
+    return _on_domain(urlsplit(url or "").hostname or "", "reddit.com")
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so the same page compares equal across feeds and runs.
+
+    Drops tracking parameters, fragments, `www.` and trailing slashes, and maps
+    arXiv abs/pdf/versioned links and reddit post permalinks to one form each.
+    """
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+
+    if host in ("arxiv.org", "export.arxiv.org"):
+        m = _ARXIV_ID.match(path)
+        if m:
+            return f"https://arxiv.org/abs/{m.group(1)}"
+    if _on_domain(host, "reddit.com"):
+        m = _REDDIT_POST.match(path)
+        if m:
+            return f"https://reddit.com/comments/{m.group(1)}"
+        host = "reddit.com"
+
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit(("https" if parts.scheme in ("http", "https") else parts.scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def reddit_link_target(html: str) -> Optional[str]:
+    """The external URL a reddit RSS link post points at, if any."""
+    m = _REDDIT_LINK.search(html or "")
+    if not m:
+        return None
+    target = m.group(1).replace("&amp;", "&")
+    host = urlsplit(target).netloc.lower()
+    if _on_domain(host, "reddit.com") or _on_domain(host, "redd.it"):
+        return None
+    return target
@@ -0,0 +1,81 @@
+"""Feed payload builders for the offline benchmarks.
+
+Used both to (re)generate the snapshot fixtures and to synthesize scaled-up
+feeds with tens of thousands of entries.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import random
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+_WORDS = (
+    "llm agent model transformer benchmark eval rag embedding fine-tuning inference quantization gguf "
+    "diffusion vision multimodal reasoning kernel cuda open-weight release paper dataset tokenizer "
+    "moe sparse attention long-context retrieval tool-use safety alignment distillation local "
+    "cooking garden travel music finance sports weather history art design startup hiring"
+).split()
+
+
+def synthetic_items(n: int, seed: int = 0, start: dt.datetime = dt.datetime(2026, 2, 14, tzinfo=dt.timezone.utc)) -> list[dict]:
+    """`n` fake items ({title, url, published, points}), newest first, one every ~10 minutes."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        words = rng.sample(_WORDS, rng.randint(4, 10))
+        out.append(
+            {
+                "title": " ".join(words).capitalize(),
+                "url": f"https://example.com/post/{seed}/{i}?utm_source=bench",
+                "published": start - dt.timedelta(minutes=10 * i),
+                "points": rng.randint(0, 2000),
+            }
+        )
+    return out
+
+
+def rss2(title: str, items: list[dict]) -> bytes:
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel><title>{escape(title)}</title>']
+    for it in items:
+        parts.append(
+            f"<item><title>{escape(it['title'])}</title><link>{escape(it['url'])}</link>"
+            f"<guid>{escape(it['url'])}</guid><pubDate>{format_datetime(it['published'], usegmt=True)}</pubDate>"
+            f"<description>{escape(it['title'])}</description></item>"
+        )
+    parts.append("</channel></rss>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def atom(title: str, items: list[dict]) -> bytes:
+    """Reddit-style Atom feed; each entry links to a comments page and its content carries the [link]."""
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom"><title>{escape(title)}</title>']
+    for i, it in enumerate(items):
+        content = escape(f'submitted by <a href="https://www.reddit.com/user/u{i}"> /u/u{i} </a> <br/> <span><a href="{it["url"]}">[link]</a></span>')
+        parts.append(
+            f"<entry><title>{escape(it['title'])}</title>"
+            f'<link href="https://www.reddit.com/r/bench/comments/{i:x}/post_{i}/"/>'
+            f"<id>t3_{i:x}</id><updated>{it['published'].isoformat()}</updated>"
+            f'<content type="html">{content}</content></entry>'
+        )
+    parts.append("</feed>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def algolia(items: list[dict]) -> bytes:
+    hits = [
+        {
+            "title": it["title"],
+            "url": it["url"],
+            "points": it["points"],
+            "created_at": it["published"].strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "objectID": str(i),
+        }
+        for i, it in enumerate(items)
+    ]
+    return json.dumps({"hits": hits, "nbHits": len(hits)}).encode("utf-8")
+
+
+BUILDERS = {"rss": rss2, "atom": atom}
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Offline benchmarks for ai-signal-radar and ai-news-digest.
+
+Every feed URL the tools use is answered by a local replay server from the
+snapshots in bench/fixtures/, so nothing touches the network. On top of an
+end-to-end run of both tools, each stage is timed against synthetic feeds of
+--sizes entries, with a second pass under tracemalloc for peak memory.
+
+    python bench/run.py --out bench_output.json
+    python bench/run.py --sizes 1000 --repeat 1     # quick smoke run
+    python bench/run.py --record                    # refresh fixtures from the live feeds
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime as dt
+import gc
+import http.server
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+FIXTURES = os.path.join(HERE, "fixtures")
+sys.path[:0] = [HERE, os.path.join(ROOT, "ai-signal-radar"), os.path.join(ROOT, "ai-news-digest")]
+
+import digest  # noqa: E402
+import feeds  # noqa: E402
+from src import radar  # noqa: E402
+from src.keywords import KeywordMatcher  # noqa: E402
+
+
+class ReplayServer:
+    """Serves registered payloads by path from a background thread on 127.0.0.1."""
+
+    def __init__(self):
+        self.routes: dict[str, tuple[bytes, str]] = {}
+        routes = self.routes
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):  # noqa: N802
+                body, ctype = routes.get(self.path.split("?", 1)[0], (None, None))
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # streaming readers hang up once they have enough
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> "ReplayServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+
+    def add(self, path: str, body: bytes, ctype: str) -> str:
+        self.routes[path] = (body, ctype)
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+
+def load_manifest() -> list[dict]:
+    with open(os.path.join(FIXTURES, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record(manifest: list[dict]) -> None:
+    import requests
+
+    for entry in manifest:
+        r = requests.get(entry["url"], headers={"User-Agent": radar.USER_AGENT}, timeout=30)
+        r.raise_for_status()
+        with open(os.path.join(FIXTURES, entry["file"]), "wb") as f:
+            f.write(r.content)
+        print(f"recorded {entry['url']} -> {entry['file']} ({len(r.content)} bytes)")
+
+
+def measure(name: str, size: Optional[int], fn: Callable[[], object], repeat: int) -> dict:
+    """Best-of-`repeat` wall time, then one more run under tracemalloc for the peak.
+
+    With `size=None` the item count is taken from the length of what `fn` returns.
+    """
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    if size is None:
+        size = len(out) if hasattr(out, "__len__") else 1
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        "name": name,
+        "size": size,
+        "seconds": round(best, 6),
+        "items_per_sec": round(size / best, 1) if best > 0 else None,
+        "peak_bytes": peak,
+    }
+    print(f"{name:<36} n={size:<7} {best * 1000:10.1f} ms  {result['items_per_sec'] or 0:12.0f} items/s  {peak / 1e6:8.1f} MB peak", file=sys.stderr)
+    return result
+
+
+def _chunks(items: list, n: int) -> list:
+    return [items[i : i + n] for i in range(0, len(items), n)]
+
+
+def bench_fixtures(server: ReplayServer, manifest: list[dict], repeat: int) -> list[dict]:
+    """Replay every recorded source through the real fetch/parse code, then run both CLIs end to end."""
+    results = []
+    radar_sources = []
+    digest_sources = []
+    for entry in manifest:
+        with open(os.path.join(FIXTURES, entry["file"]), "rb") as f:
+            body = f.read()
+        url = server.add("/" + entry["file"], body, entry["content_type"])
+        if "radar" in entry["tools"]:
+            src = radar.Source(entry["name"], url, kind=entry.get("kind", "rss"))
+            radar_sources.append(src)
+            results.append(measure(f"radar.fetch:{entry['file']}", None, lambda src=src: radar.fetch_source(src, 1000), repeat))
+        if "digest" in entry["tools"]:
+            digest_sources.append({"name": entry["name"], "url": url, "limit": 12})
+            results.append(
+                measure(f"digest.fetch:{entry['file']}", None, lambda url=url: digest.pick_items(digest.fetch_feed(url), 1000), repeat)
+            )
+            results.append(measure(f"digest.fetch_items(12):{entry['file']}", None, lambda url=url: digest.fetch_items(url, 12), repeat))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        radar_cfg = os.path.join(tmp, "radar_sources.json")
+        digest_cfg = os.path.join(tmp, "digest_sources.json")
+        with open(radar_cfg, "w", encoding="utf-8") as f:
+            json.dump({"sources": [{"name": s.name, "url": s.url, "kind": s.kind} for s in radar_sources]}, f)
+        with open(digest_cfg, "w", encoding="utf-8") as f:
+            json.dump({"sources": digest_sources}, f)
+        radar_argv = ["--sources", radar_cfg, "--out", tmp, "--no-cache", "--format", "markdown,discord,slack,json"]
+        # No archive: keep the run self-contained and its cost out of the timing.
+        digest_argv = ["--sources", digest_cfg, "--out", os.path.join(tmp, "digest.md"), "--archive", ""]
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            results.append(measure("radar.main (offline)", len(radar_sources), lambda: radar.main(radar_argv), repeat))
+            results.append(measure("digest.main (offline)", len(digest_sources), lambda: digest.main(digest_argv), repeat))
+    return results
+
+
+def bench_scaled(server: ReplayServer, size: int, repeat: int) -> list[dict]:
+    synthetic = feeds.synthetic_items(size, seed=size)
+    url = server.add(f"/synthetic-{size}.xml", feeds.rss2(f"synthetic {size}", synthetic), "application/rss+xml")
+    results = []
+
+    items: list = []
+
+    def parse_radar() -> None:
+        items[:] = radar.fetch_rss(url, "bench", size)
+
+    results.append(measure("radar.fetch_rss", size, parse_radar, repeat))
+
+    picked: list = []
+
+    def parse_digest() -> None:
+        picked[:] = digest.pick_items(digest.fetch_feed(url), size)
+
+    results.append(measure("digest.fetch_feed+pick_items", size, parse_digest, repeat))
+    results.append(measure("digest.fetch_items(12)", 12, lambda: digest.fetch_items(url, 12), repeat))
+
+    matcher = KeywordMatcher(radar.DEFAULT_KEYWORDS)
+    results.append(measure("filter_by_keywords", size, lambda: radar.filter_by_keywords(items, matcher), repeat))
+    results.append(measure("filter_by_keywords(all)", size, lambda: radar.filter_by_keywords(items, matcher, include_all=True), repeat))
+    since_ts = radar.parse_ts(synthetic[size // 2]["published"].isoformat())
+    results.append(measure("since filter", size, lambda: radar.filter_since(items, since_ts), repeat))
+
+    day = dt.date(2026, 2, 14)
+    groups = [(f"group {i}", chunk) for i, chunk in enumerate(_chunks(items, 8))]
+    sections = [(f"section {i}", chunk) for i, chunk in enumerate(_chunks(picked, 12))]
+    results.append(measure("render_md", size, lambda: radar.render_md(day, groups), repeat))
+    results.append(measure("render_discord", size, lambda: radar.render_discord(day, groups), repeat))
+    results.append(measure("render_slack", size, lambda: radar.render_slack(day, groups), repeat))
+    results.append(measure("render_markdown (digest)", size, lambda: digest.render_markdown(sections), repeat))
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Offline benchmarks for the radar and digest pipelines.")
+    ap.add_argument("--sizes", default="10000,100000", help="comma-separated synthetic feed sizes")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is reported)")
+    ap.add_argument("--out", help="write results JSON here (default: stdout)")
+    ap.add_argument("--record", action="store_true", help="refresh bench/fixtures from the live feeds and exit")
+    args = ap.parse_args(argv)
+
+    manifest = load_manifest()
+    if args.record:
+        record(manifest)
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    with ReplayServer() as server:
+        results = bench_fixtures(server, manifest, args.repeat)
+        for size in sizes:
+            results += bench_scaled(server, size, args.repeat)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+            "sizes": sizes,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
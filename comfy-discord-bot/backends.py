@@ -0,0 +1,261 @@
+"""Load balancing across several ComfyUI backends.
+
+Each backend has its own pooled client and websocket. A background loop
+polls every backend's `/queue` for depth and health, and `/object_info` now
+and then for its checkpoints. The last results are kept, so queue and
+model listings are answered from memory. A new prompt goes to the least-loaded healthy
+backend that has the workflow's checkpoint. Load is the backend's queue
+depth from other clients plus our own prompts on it, so bursts between polls
+still spread out. The backend of every prompt is remembered until the job
+releases it, so waits, history, downloads and cancels reach the right host.
+When a backend turns unhealthy, the waits of its prompts fail with
+`BackendDown` so the caller can queue them again elsewhere. A POST /prompt
+that times out or loses its reply is first looked up in that backend's queue
+and history, so a prompt that did get queued is not run a second time.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+import aiohttp
+
+from comfy_client import ComfyClient
+from comfy_ws import ComfyEvents
+
+
+class BackendDown(Exception):
+    """The backend running a prompt became unreachable; queue it again elsewhere."""
+
+
+class NoBackend(Exception):
+    pass
+
+
+def checkpoints_from_object_info(data: dict) -> set:
+    """Checkpoint names from GET /object_info/CheckpointLoaderSimple."""
+    spec = data.get("CheckpointLoaderSimple", {}).get("input", {}).get("required", {}).get("ckpt_name", [])
+    names = spec[0] if spec and isinstance(spec[0], list) else spec
+    return {n for n in names if isinstance(n, str)}
+
+
+def workflow_checkpoint(workflow: dict) -> Optional[str]:
+    for node in workflow.values():
+        if node.get("class_type") == "CheckpointLoaderSimple":
+            return node.get("inputs", {}).get("ckpt_name")
+    return None
+
+
+class Backend:
+    def __init__(self, host: str, client_id: str):
+        self.host = host.rstrip("/")
+        self.client = ComfyClient(self.host, client_id)
+        self.events: Optional[ComfyEvents] = None
+        self.healthy = False
+        self.failures = 0
+        self.others = 0  # queued/running prompts that aren't ours, as of the last poll
+        self.prompts: set[str] = set()  # our prompts on this backend
+        self.checkpoints: Optional[set] = None  # None until first fetched
+        self.checkpoints_at = 0.0
+        self.running = 0  # ComfyUI's queue as of the last poll
+        self.pending = 0
+        self.polled_at = 0.0
+
+    @property
+    def load(self) -> int:
+        return self.others + len(self.prompts)
+
+    def has(self, checkpoint: Optional[str]) -> bool:
+        return checkpoint is None or self.checkpoints is None or checkpoint in self.checkpoints
+
+
+class BackendPool:
+    def __init__(
+        self,
+        hosts: list,
+        client_id: str,
+        interval: float = 5.0,
+        fail_after: int = 2,
+        checkpoints_every: float = 60.0,
+    ):
+        if not hosts:
+            raise ValueError("at least one ComfyUI backend is required")
+        self.backends = [Backend(h, client_id) for h in hosts]
+        self.client_id = client_id
+        self.interval = interval
+        self.fail_after = fail_after
+        self.checkpoints_every = checkpoints_every
+        self._by_prompt: dict[str, Backend] = {}
+        self._warned: set = set()  # checkpoints already reported as listed nowhere
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        for b in self.backends:
+            await b.client.start()
+            b.events = ComfyEvents(b.host, self.client_id, b.client.history, session=b.client.session)
+            await b.events.start()
+        await self._check_all()
+        self._task = asyncio.create_task(self._monitor(), name="comfy-health")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for b in self.backends:
+            if b.events is not None:
+                await b.events.close()
+            await b.client.close()
+
+    # -- health --------------------------------------------------------------
+
+    async def _check(self, b: Backend) -> None:
+        try:
+            queue = await b.client.queue(timeout=5, retries=0)
+            if b.checkpoints is None or time.monotonic() - b.checkpoints_at > self.checkpoints_every:
+                b.checkpoints = checkpoints_from_object_info(await b.client.object_info("CheckpointLoaderSimple", retries=0))
+                b.checkpoints_at = time.monotonic()
+            running = len(queue.get("queue_running", []))
+            pending = len(queue.get("queue_pending", []))
+        except Exception as e:  # noqa: BLE001 - a proxy error page or malformed reply is a failed check too
+            b.failures += 1
+            if b.healthy and b.failures >= self.fail_after:
+                print(f"[backends] {b.host} is unhealthy: {type(e).__name__}: {e}")
+                self._mark_down(b)
+            elif not b.healthy and b.failures == 1:
+                print(f"[backends] {b.host} unreachable: {type(e).__name__}: {e}")
+            return
+        b.running, b.pending = running, pending
+        b.polled_at = time.monotonic()
+        depth = b.running + b.pending
+        b.others = max(0, depth - len(b.prompts))
+        if not b.healthy:
+            print(f"[backends] {b.host} is healthy (queue depth {depth})")
+        b.healthy = True
+        b.failures = 0
+
+    def _mark_down(self, b: Backend) -> None:
+        b.healthy = False
+        # Drain: every prompt waiting on this backend fails over to the caller, who requeues it.
+        for prompt_id in list(b.prompts):
+            b.events.abort(prompt_id, BackendDown(f"backend {b.host} went down"))
+
+    async def _check_all(self) -> None:
+        # One backend's unexpected error must not cancel the others' checks or end the loop.
+        results = await asyncio.gather(*(self._check(b) for b in self.backends), return_exceptions=True)
+        for b, result in zip(self.backends, results):
+            if isinstance(result, Exception):
+                print(f"[backends] health check of {b.host} failed: {type(result).__name__}: {result}")
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._check_all()
+
+    # -- routing ---------------------------------------------------------------
+
+    def pick(self, checkpoint: Optional[str] = None, exclude: tuple = ()) -> Backend:
+        healthy = [b for b in self.backends if b.healthy and b not in exclude]
+        if not healthy:
+            raise NoBackend("No ComfyUI backend is reachable right now.")
+        capable = [b for b in healthy if b.has(checkpoint)]
+        if not capable:
+            # Nobody lists it: let ComfyUI itself reject the workflow with a useful error.
+            if checkpoint not in self._warned:
+                self._warned.add(checkpoint)
+                print(f"[backends] no backend lists checkpoint {checkpoint!r}; using any healthy one")
+            capable = healthy
+        return min(capable, key=lambda b: b.load)
+
+    def backend_for(self, prompt_id: str) -> Backend:
+        b = self._by_prompt.get(prompt_id)
+        if b is None:
+            raise KeyError(f"unknown prompt {prompt_id}")
+        return b
+
+    async def queue_prompt(self, workflow: dict, prompt_id: str) -> str:
+        """Queue on the best backend, moving on to the next one if it turns out to be unreachable."""
+        checkpoint = workflow_checkpoint(workflow)
+        tried: list = []
+        while True:
+            b = self.pick(checkpoint, exclude=tuple(tried))
+            # Watch before queueing so a fast (or fully cached) prompt can't finish unseen.
+            b.events.watch(prompt_id)
+            b.prompts.add(prompt_id)
+            self._by_prompt[prompt_id] = b
+            try:
+                return await b.client.queue_prompt(workflow, prompt_id)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Unless we never got through, the prompt may have been queued before the
+                # reply was lost; requeueing it elsewhere would then run it twice.
+                try:
+                    landed = not isinstance(e, aiohttp.ClientConnectorError) and await self._landed(b, prompt_id)
+                except BaseException:
+                    self.release(prompt_id)
+                    raise
+                if landed:
+                    print(f"[backends] {b.host} queued {prompt_id} despite {type(e).__name__}")
+                    return prompt_id
+                self.release(prompt_id)
+                b.failures = self.fail_after
+                self._mark_down(b)
+                print(f"[backends] {b.host} failed to queue: {type(e).__name__}: {e}")
+                tried.append(b)
+            except BaseException:
+                self.release(prompt_id)
+                raise
+
+    async def _landed(self, b: Backend, prompt_id: str) -> bool:
+        """Whether `prompt_id` is queued, running or done on `b` (False if `b` can't say)."""
+        try:
+            queue = await b.client.queue(timeout=5, retries=0)
+            for entry in queue.get("queue_running", []) + queue.get("queue_pending", []):
+                if len(entry) > 1 and entry[1] == prompt_id:
+                    return True
+            return prompt_id in await b.client.history(prompt_id)
+        except Exception:  # noqa: BLE001 - unreachable or garbled: treat it as down
+            return False
+
+    def release(self, prompt_id: str) -> None:
+        """Forget `prompt_id` once its job is done with it."""
+        b = self._by_prompt.pop(prompt_id, None)
+        if b is not None:
+            b.prompts.discard(prompt_id)
+            b.events.forget(prompt_id)
+
+    async def wait(self, prompt_id: str, timeout: float, on_progress=None, timings: Optional[dict] = None) -> list:
+        return await self.backend_for(prompt_id).events.wait(prompt_id, timeout, on_progress, timings)
+
+    async def history(self, prompt_id: str) -> dict:
+        return await self.backend_for(prompt_id).client.history(prompt_id)
+
+    async def view_into(self, prompt_id: str, fileobj, filename: str, subfolder: str = "", type: str = "output") -> int:
+        return await self.backend_for(prompt_id).client.view_into(fileobj, filename, subfolder, type)
+
+    async def cancel(self, prompt_id: str) -> None:
+        await self.backend_for(prompt_id).client.cancel(prompt_id)
+
+    def checkpoints(self) -> list:
+        names: set = set()
+        for b in self.backends:
+            names |= b.checkpoints or set()
+        return sorted(names)
+
+    def status(self) -> list:
+        """Health and queue of every backend as of the last poll (at most `interval` seconds old)."""
+        now = time.monotonic()
+        return [
+            {
+                "host": b.host,
+                "healthy": b.healthy,
+                "load": b.load,
+                "ours": len(b.prompts),
+                "running": b.running,
+                "pending": b.pending,
+                "age": now - b.polled_at if b.polled_at else None,
+            }
+            for b in self.backends
+        ]
@@ -0,0 +1,114 @@
+"""Batch-coalescing of concurrent generations.
+
+Requests that differ only in prompt and seed (same template, size,
+checkpoint and sampler settings) are collected for `window` seconds, or
+until `max_size` of them are waiting. They then go to ComfyUI as one merged
+workflow (see `workflows.merge_workflows`): one /prompt call and one wait
+for its history instead of one per request, for the price of the window's
+added latency. Sampling costs the same; ComfyUI already keeps loaded models
+between prompts and runs the batch's samplers one after another. Images are
+split back to each request by the SaveImage node they came from.
+
+ComfyUI's own `batch_size` shares one prompt and one noise seed across the
+batch, so it can't carry different prompts without changing what each
+request (and its cache key) would produce on its own; merging graphs can.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from workflows import merge_workflows
+
+# run(graph, on_progress, size) -> [(output node id, delivery.Output), ...]
+RunFn = Callable[..., Awaitable[list]]
+
+
+class _Entry:
+    def __init__(self, graph: dict, on_progress):
+        self.graph = graph
+        self.on_progress = on_progress
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _Batch:
+    def __init__(self):
+        self.entries: list[_Entry] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class Batcher:
+    def __init__(self, run: RunFn, window: float = 0.0, max_size: int = 4):
+        self.run = run
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._open: dict[str, _Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_size > 1
+
+    async def submit(self, key: str, graph: dict, on_progress=None) -> list:
+        """Run `graph`, batched with others of the same `key`; returns its Outputs."""
+        if not self.enabled:
+            return [out for _, out in await self.run(graph, on_progress, 1)]
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = _Batch()
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._close, key, batch)
+        entry = _Entry(graph, on_progress)
+        batch.entries.append(entry)
+        entry.future.add_done_callback(lambda _: self._abandoned(batch))
+        if len(batch.entries) >= self.max_size:
+            self._close(key, batch)
+        return await entry.future
+
+    def _close(self, key: str, batch: _Batch) -> None:
+        if self._open.get(key) is batch:
+            del self._open[key]
+        batch.timer.cancel()
+        batch.task = asyncio.create_task(self._flush(batch), name="comfy-batch")
+        self._tasks.add(batch.task)
+        batch.task.add_done_callback(self._tasks.discard)
+
+    def _abandoned(self, batch: _Batch) -> None:
+        # Everyone in a running batch was cancelled: cancel the run itself (and with it the ComfyUI prompt).
+        if batch.task is not None and not batch.task.done() and all(e.future.cancelled() for e in batch.entries):
+            batch.task.cancel()
+
+    async def _flush(self, batch: _Batch) -> None:
+        entries = [e for e in batch.entries if not e.future.done()]  # drop requests cancelled while waiting
+        if not entries:
+            return
+        if len(entries) == 1:
+            graph, owners = entries[0].graph, None
+        else:
+            graph, owners = merge_workflows([e.graph for e in entries])
+            print(f"[batch] running {len(entries)} requests as one workflow ({len(graph)} nodes)")
+
+        async def on_progress(value: int, maximum: int):
+            for e in entries:
+                if e.on_progress is not None and not e.future.done():
+                    await e.on_progress(value, maximum)
+
+        try:
+            images = await self.run(graph, on_progress, len(entries))
+        except asyncio.CancelledError:
+            for e in entries:
+                e.future.cancel()
+            raise
+        except Exception as exc:  # noqa: BLE001 - handed to every waiter
+            for e in entries:
+                if not e.future.done():
+                    e.future.set_exception(exc)
+            return
+        split: list[list] = [[] for _ in entries]
+        for node, out in images:
+            split[owners.get(node, 0) if owners else 0].append(out)
+        for e, mine in zip(entries, split):
+            if not e.future.done():
+                e.future.set_result(mine)
+            else:  # cancelled during the run: nobody will post these
+                for out in mine:
+                    out.release()
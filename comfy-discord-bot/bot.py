@@ -6,175 +6,403 @@ Triggers image generation on remote ComfyUI server and sends results back to Dis
 
 import os
 import asyncio
-import aiohttp
+import random
 import discord
 from discord import app_commands
 import uuid
-import json
 import time
+import traceback
+from typing import Optional
+
+from backends import BackendDown, BackendPool
+from batching import Batcher
+from comfy_client import ComfyError
+from delivery import Output, deliver, fit, release, spooled
+from metrics import Metrics, MetricsServer
+from results import Coalescer, ResultCache, workflow_key
+from scheduler import Job, JobRejected, JobScheduler
+from workflows import WorkflowError, WorkflowRegistry
 
 # Config from environment
 DISCORD_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 COMFY_HOST = os.getenv("COMFY_HOST", "http://lucapc.tail932dcc.ts.net:8000")
-CLIENT_ID = os.getenv("COMFY_CLIENT_ID")
+# Several GPU boxes: COMFY_HOSTS=http://a:8188,http://b:8188 (defaults to COMFY_HOST).
+COMFY_HOSTS = [h.strip() for h in os.getenv("COMFY_HOSTS", COMFY_HOST).split(",") if h.strip()]
+# Batching: compatible /gen requests arriving within BOT_BATCH_WINDOW seconds go to
+# ComfyUI as one workflow of up to BOT_BATCH_MAX requests (window 0 = off). Only jobs
+# the scheduler is running can join a batch, so COMFY_MAX_IN_FLIGHT caps its size too.
+BATCH_WINDOW = float(os.getenv("BOT_BATCH_WINDOW", "0"))
+BATCH_MAX = int(os.getenv("BOT_BATCH_MAX", "4"))
+# Images over this are re-encoded/downscaled; messages stay under it (Discord's default is 10 MB).
+UPLOAD_LIMIT = int(float(os.getenv("BOT_UPLOAD_LIMIT_MB", "10")) * 1024 * 1024)
+# Serve Prometheus metrics on 127.0.0.1:BOT_METRICS_PORT (unset = off).
+METRICS_PORT = os.getenv("BOT_METRICS_PORT")
+# ComfyUI sends execution events for our prompts to this websocket client id.
+CLIENT_ID = os.getenv("COMFY_CLIENT_ID") or str(uuid.uuid4())
 
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = discord.Client(intents=intents)
+# Workflow templates from workflows/*.json, loaded once and reloaded when a file changes.
+workflows = WorkflowRegistry(os.getenv("BOT_WORKFLOWS_DIR", "workflows"))
+
+# ComfyUI backends, each with a pooled HTTP client and a websocket; they live
+# from setup_hook until shutdown.
+backends = None
+
+
+async def start_comfy():
+    global backends
+    backends = BackendPool(COMFY_HOSTS, CLIENT_ID)
+    await backends.start()
+
+
+async def stop_comfy():
+    global backends
+    results.save()
+    if backends is not None:
+        await backends.close()
+        backends = None
+
+
+# Per-stage latencies and counters for /stats and the optional Prometheus endpoint.
+metrics = Metrics()
+metrics_server = MetricsServer(metrics, port=int(METRICS_PORT)) if METRICS_PORT else None
+
+
+class ComfyBot(discord.Client):
+    async def setup_hook(self):
+        workflows.start()
+        await start_comfy()
+        if metrics_server is not None:
+            await metrics_server.start()
+
+    async def close(self):
+        if metrics_server is not None:
+            await metrics_server.close()
+        await stop_comfy()
+        await workflows.close()
+        await super().close()
+
+
+bot = ComfyBot(intents=intents)
 tree = app_commands.CommandTree(bot)
 
-# Track active generations
-generations = {}
-
-
-async def queue_comfy_prompt(prompt: str, workflow: str = "default") -> str:
-    """Queue a prompt on ComfyUI and return the prompt_id."""
-    # Load workflow template
-    workflow_path = f"workflows/{workflow}.json"
-    if not os.path.exists(workflow_path):
-        # Use default simple prompt workflow
-        workflow_data = {
-            "3": {"inputs": {"seed": int(time.time() * 1000) % 1000000000000, "steps": 20, "cfg": 8, "sampler_name": "euler", "scheduler": "normal", "positive": prompt, "negative": "", "model": ["4", 0], "clip": ["6", 0], "vae": ["7", 0]}, "class_type": "KSampler"},
-            "4": {"inputs": {"ckpt_name": "sd15_default.json"}, "class_type": "CheckpointLoaderSimple"},
-            "6": {"inputs": {"text": "", "clip": ["4", 1]}, "class_type": "CLIPTextEncode"},
-            "7": {"inputs": {"vae_name": "vae-ft-mse-840000-ema-pruned.safetensors"}, "class_type": "VAELoader"},
-            "8": {"inputs": {"width": 512, "height": 512, "batch_size": 1}, "class_type": "EmptyLatentImage"},
-            "9": {"inputs": {"samples": ["3", 0], "vae": ["7", 0]}, "class_type": "VAEDecode"},
-            "10": {"inputs": {"images": ["9", 0], "filename_prefix": "discord"}, "class_type": "SaveImage"}
-        }
-    else:
-        with open(workflow_path) as f:
-            workflow_data = json.load(f)
-    
-    # Replace prompt in workflow
-    if "6" in workflow_data and "inputs" in workflow_data["6"]:
-        workflow_data["6"]["inputs"]["text"] = prompt
-    
+# Generation jobs: at most COMFY_MAX_IN_FLIGHT running at once (default two per
+# backend), picked round-robin across channels and users.
+scheduler = JobScheduler(
+    max_in_flight=int(os.getenv("COMFY_MAX_IN_FLIGHT", str(2 * len(COMFY_HOSTS)))),
+    max_queued=int(os.getenv("BOT_MAX_QUEUE", "50")),
+    per_user=int(os.getenv("BOT_USER_QUOTA", "3")),
+)
+
+# Finished images on disk by workflow hash (BOT_CACHE_MB=0 turns it off); identical
+# requests that are already queued or running share that one job. Only requests with
+# an explicit seed are reused: without one every run is meant to be a new image.
+results = ResultCache(os.getenv("BOT_CACHE_DIR", ".cache/results"), int(os.getenv("BOT_CACHE_MB", "1024")) * 1024 * 1024)
+coalescer = Coalescer()
+_followers: set[asyncio.Task] = set()
+
+
+def build_workflow(prompt: str, workflow: str = "default", seed: int = None) -> dict:
+    """The workflow graph for `prompt`, exactly as it will be sent to ComfyUI (random seed if none given)."""
+    if seed is None:
+        seed = random.randrange(1000000000000)
+    return workflows.get(workflow).build(prompt, seed=seed)
+
+
+async def queue_comfy_prompt(workflow_data: dict) -> str:
+    """Queue a workflow on ComfyUI and return the prompt_id."""
     prompt_id = str(uuid.uuid4())
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.post(f"{COMFY_HOST}/prompt", json={"prompt": workflow_data, "prompt_id": prompt_id}) as resp:
-            if resp.status != 200:
-                raise Exception(f"Failed to queue prompt: {await resp.text()}")
-            result = await resp.json()
-            return result.get("prompt_id", prompt_id)
+    return await backends.queue_prompt(workflow_data, prompt_id)
 
 
 async def get_comfy_history(prompt_id: str) -> dict:
     """Get history for a prompt."""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"{COMFY_HOST}/history/{prompt_id}") as resp:
-            if resp.status == 200:
-                return await resp.json()
-            return {}
+    return await backends.history(prompt_id)
 
 
-async def get_comfy_queue() -> dict:
-    """Get current queue status."""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"{COMFY_HOST}/queue") as resp:
-            if resp.status == 200:
-                return await resp.json()
-            return {}
+async def get_comfy_queue() -> list:
+    """Queue status of every backend, from the health monitor's last poll (no request to ComfyUI)."""
+    return backends.status()
 
 
 async def get_comfy_models() -> list:
-    """Get available checkpoint models."""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"{COMFY_HOST}/object_info/CheckpointLoaderSimple") as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                return data.get("object_info", {}).get("CheckpointLoaderSimple", {}).get("input", {}).get("required", {}).get("ckpt_name", [""],)
-            return []
+    """Available checkpoint models across all backends, as last fetched by the health monitor."""
+    return backends.checkpoints()
 
 
-async def wait_for_comfy(prompt_id: str, timeout: int = 120) -> list:
+async def wait_for_comfy(prompt_id: str, timeout: int = 120, on_progress=None, timings: dict = None) -> list:
     """Wait for generation to complete and return output images."""
-    start = time.time()
-    while time.time() - start < timeout:
-        await asyncio.sleep(2)
-        history = await get_comfy_history(prompt_id)
-        if prompt_id in history:
-            status = history[prompt_id].get("status", {})
-            if status.get("completed", False):
-                # Find output images
-                outputs = history[prompt_id].get("outputs", {})
-                images = []
-                for node_id, node_data in outputs.items():
-                    if "images" in node_data:
-                        for img in node_data["images"]:
-                            images.append({
-                                "filename": img["filename"],
-                                "subfolder": img.get("subfolder", ""),
-                                "type": img.get("type", "output")
-                            })
-                return images
-    return []
-
-
-async def download_image(session: aiohttp.ClientSession, filename: str, subfolder: str = "", type: str = "output") -> bytes:
-    """Download an image from ComfyUI."""
-    params = {"filename": filename, "subfolder": subfolder, "type": type}
-    async with session.get(f"{COMFY_HOST}/view", params=params) as resp:
-        if resp.status == 200:
-            return await resp.read()
-        raise Exception(f"Failed to download image: {resp.status}")
+    return await backends.wait(prompt_id, timeout, on_progress, timings)
+
+
+def progress_editor(edit, text: str, every: float = 2.0):
+    """Progress callback that calls `edit` with sampler steps, at most once per `every` seconds."""
+    last = 0.0
+    inflight = None
+
+    async def on_progress(value: int, maximum: int):
+        nonlocal last, inflight
+        now = time.monotonic()
+        if (now - last < every and value < maximum) or (inflight is not None and not inflight.done()):
+            return
+        last = now
+        inflight = asyncio.create_task(edit(f"{text} — step {value}/{maximum}"))
+
+    return on_progress
+
+
+async def download_image(prompt_id: str, filename: str, subfolder: str = "", type: str = "output") -> Output:
+    """Stream an image of `prompt_id` from the backend that made it, shrunk to fit Discord's upload limit."""
+    file = spooled()
+    try:
+        size = await backends.view_into(prompt_id, file, filename, subfolder, type)
+    except BaseException:
+        file.close()
+        raise
+    return await fit(Output(filename, size, file=file), UPLOAD_LIMIT)
+
+
+async def run_generation(job: Job, workflow: dict, key: Optional[str], batch_key: str, send) -> None:
+    """Scheduler job body: generate, cache and share the images (unless `key` is None), deliver them with `send`."""
+    metrics.observe("wait", job.started - job.created)
+    status = f"🎨 Generating: *{job.prompt}* (#{job.id})"
+    await job.notify(status)
+    try:
+        images = await batcher.submit(batch_key, workflow, progress_editor(job.notify, status))
+    except Exception as e:
+        if key is not None:
+            coalescer.fail(key, e)
+        raise
+    try:
+        if key is not None:
+            await results.put(key, images)
+            coalescer.finish(key, images)
+        t = time.monotonic()
+        await deliver(send, images, UPLOAD_LIMIT)
+        metrics.observe("upload", time.monotonic() - t)
+    finally:
+        release(images)
+    metrics.observe("total", time.monotonic() - job.created)
+    await job.notify(f"✅ Done: *{job.prompt}* (#{job.id})")
+
+
+def job_finished(job: Job, key: Optional[str]) -> None:
+    if key is not None:
+        coalescer.abandon(key)
+    metrics.inc(f"jobs_{job.state}")
+
+
+async def run_workflow(workflow: dict, on_progress=None, size: int = 1) -> list:
+    """Run `workflow` (`size` requests' worth) on ComfyUI, moving to another backend if one goes down.
+
+    Returns [(output node id, Output), ...]; raises ComfyError if it timed out or failed.
+    """
+    for _ in range(3):
+        queued = time.monotonic()
+        prompt_id = await queue_comfy_prompt(workflow)
+        timings = {}
+        try:
+            images = await wait_for_comfy(prompt_id, timeout=120 * size, on_progress=on_progress, timings=timings)
+            if "started" in timings:
+                metrics.observe("comfy_queue", timings["started"] - queued)
+                metrics.observe("execute", time.monotonic() - timings["started"])
+            break
+        except BackendDown as e:
+            # Its GPU box went away: requeue on another backend.
+            print(f"Prompt {prompt_id}: {e}; requeueing")
+            backends.release(prompt_id)
+        except asyncio.CancelledError:
+            try:
+                await backends.cancel(prompt_id)
+            except Exception as e:  # noqa: BLE001
+                print(f"Failed to cancel {prompt_id} on ComfyUI: {e}")
+            backends.release(prompt_id)
+            raise
+    else:
+        raise ComfyError("ComfyUI backends kept failing; try again later.")
+    try:
+        if not images:
+            raise ComfyError("Generation timed out or failed.")
+        metrics.inc("comfy_runs")
+        metrics.inc("images", len(images))
+        t = time.monotonic()
+        outputs = await asyncio.gather(
+            *(download_image(prompt_id, img["filename"], img["subfolder"], img["type"]) for img in images),
+            return_exceptions=True,
+        )
+        failed = [out for out in outputs if isinstance(out, BaseException)]
+        if failed:
+            release([out for out in outputs if isinstance(out, Output)])
+            raise failed[0]
+        metrics.observe("download", time.monotonic() - t)
+        return [(img["node"], out) for img, out in zip(images, outputs)]
+    finally:
+        backends.release(prompt_id)
+
+
+batcher = Batcher(run_workflow, BATCH_WINDOW, BATCH_MAX)
+
+
+async def start_generation(user_id: int, channel_id: int, prompt: str, send, status, seed: int = None, workflow: str = "default") -> None:
+    """Answer from the result cache, join an identical job already in flight, or schedule a new one.
+
+    Only a request with an explicit `seed` can match an earlier one; without a
+    seed it gets a random one and always runs. Raises JobRejected if the scheduler won't take the job, WorkflowError for an unknown workflow.
+    """
+    t = time.monotonic()
+    graph = build_workflow(prompt, workflow, seed)
+    key = workflow_key(graph, workflow) if seed is not None else None
+    # Requests that differ only in prompt and seed can share a batch.
+    batch_key = workflow_key(build_workflow("", workflow, 0), workflow)
+    cached = results.get(key) if key is not None else None
+    if cached:
+        await deliver(send, cached, UPLOAD_LIMIT)
+        metrics.inc("cache_hits")
+        metrics.observe("cache_hit", time.monotonic() - t)
+        await status(f"✅ Done (cached): *{prompt}*")
+        return
+    shared = coalescer.join(key) if key is not None else None
+    if shared is not None:
+        metrics.inc("coalesced")
+        await status(f"🔗 Same request is already queued; sharing its result: *{prompt}*")
+        task = asyncio.create_task(follow(shared, user_id, channel_id, prompt, send, status, seed, workflow))
+        _followers.add(task)
+        task.add_done_callback(_followers.discard)
+        return
+    job = Job(
+        user_id,
+        channel_id,
+        prompt,
+        run=lambda job: run_generation(job, graph, key, batch_key, send),
+        status=status,
+        on_finish=lambda job: job_finished(job, key),
+    )
+    if key is not None:
+        coalescer.lead(key)
+    try:
+        scheduler.submit(job)
+    except JobRejected:
+        if key is not None:
+            coalescer.abandon(key)
+        raise
+
+
+async def follow(shared: asyncio.Future, user_id: int, channel_id: int, prompt: str, send, status, seed: int = None, workflow: str = "default") -> None:
+    """Deliver the result of an identical job someone else started."""
+    try:
+        try:
+            images = await asyncio.shield(shared)
+        except asyncio.CancelledError:
+            if not shared.cancelled():
+                raise
+            # The job we joined was cancelled by its owner: run it ourselves.
+            try:
+                await start_generation(user_id, channel_id, prompt, send, status, seed, workflow)
+            except (JobRejected, WorkflowError) as e:
+                await status(f"❌ {e}")
+            return
+        except Exception as e:  # noqa: BLE001 - the leader already logged it
+            await status(f"❌ Error: {e}")
+            return
+        try:
+            await deliver(send, images, UPLOAD_LIMIT)
+        finally:
+            release(images)
+        await status(f"✅ Done: *{prompt}*")
+    except Exception as e:  # noqa: BLE001
+        print(f"Failed to deliver shared result for {prompt!r}: {type(e).__name__}: {e}")
+
+
+def cancel_job(user_id: int, job_id: str = "") -> str:
+    """Cancel `job_id`, or the user's newest job; returns the reply text."""
+    if not job_id:
+        mine = scheduler.outstanding(user_id)
+        if not mine:
+            return "You have no queued or running jobs."
+        job_id = max(mine, key=lambda j: j.created).id
+    job = scheduler.cancel(job_id.lstrip("#"), user_id)
+    if job is None:
+        return f"No job #{job_id.lstrip('#')} of yours is queued or running."
+    return f"🛑 Cancelling #{job.id}."
+
+
+def queue_report(user_id: int) -> str:
+    mine = ", ".join(f"#{j.id} ({j.state}{f' {j.position}' if j.position else ''})" for j in scheduler.outstanding(user_id))
+    lines = [f"🤖 Bot: {scheduler.summary()}" + (f"; yours: {mine}" if mine else "")]
+    for b in backends.status():
+        if not b["healthy"]:
+            lines.append(f"❌ {b['host']}: unreachable")
+        else:
+            lines.append(f"🖥️ {b['host']}: {b['running']} running, {b['pending']} pending ({b['ours']} ours)")
+    return "\n".join(lines)
 
 
 @tree.command(name="gen", description="Generate an image with ComfyUI")
-async def gen_command(interaction: discord.Interaction, *, prompt: str):
+@app_commands.describe(
+    seed="Seed to reproduce an image (default: random; a repeated seed is served from the cache)",
+    workflow="Workflow template from workflows/ (default: default)",
+)
+async def gen_command(interaction: discord.Interaction, *, prompt: str, seed: int = None, workflow: str = "default"):
     """Generate an image from a text prompt."""
     await interaction.response.defer()
-    
+    status_msg = await interaction.followup.send(f"⏳ Queued: *{prompt}*", wait=True)
+
+    async def send(**kwargs):
+        try:
+            await interaction.followup.send(**kwargs)
+        except discord.HTTPException:
+            # Interaction tokens expire after 15 minutes; long queues post to the channel instead.
+            await interaction.channel.send(**kwargs)
+
     try:
-        # Queue the prompt
-        prompt_id = await queue_comfy_prompt(prompt)
-        
-        # Tell user it's processing
-        await interaction.followup.send(f"🎨 Generating: *{prompt}* (ID: {prompt_id[:8]}...)")
-        
-        # Wait for completion
-        images = await wait_for_comfy(prompt_id)
-        
-        if not images:
-            await interaction.followup.send("❌ Generation timed out or failed.")
-            return
-        
-        # Download and send images
-        async with aiohttp.ClientSession() as session:
-            for img in images:
-                img_data = await download_image(session, img["filename"], img["subfolder"], img["type"])
-                file = discord.File(fp=io.BytesIO(img_data), filename=img["filename"])
-                await interaction.followup.send(file=file)
-                
+        await start_generation(
+            interaction.user.id,
+            interaction.channel_id,
+            prompt,
+            send,
+            lambda text: status_msg.edit(content=text),
+            seed,
+            workflow,
+        )
+    except (JobRejected, WorkflowError) as e:
+        await status_msg.edit(content=f"❌ {e}")
     except Exception as e:
-        await interaction.followup.send(f"❌ Error: {str(e)}")
+        traceback.print_exc()
+        await status_msg.edit(content=f"❌ Error: {e}")
+
+
+@gen_command.autocomplete("workflow")
+async def workflow_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=n, value=n) for n in workflows.names() if current.lower() in n.lower()][:25]
+
+
+@tree.command(name="cancel", description="Cancel one of your queued or running generations")
+@app_commands.describe(job_id="Job id (e.g. a1b2c3); defaults to your latest job")
+async def cancel_command(interaction: discord.Interaction, job_id: str = ""):
+    await interaction.response.send_message(cancel_job(interaction.user.id, job_id), ephemeral=True)
 
 
 @tree.command(name="queue", description="Show ComfyUI queue status")
 async def queue_command(interaction: discord.Interaction):
-    """Show current queue status."""
-    await interaction.response.defer()
-    try:
-        queue = await get_comfy_queue()
-        await interaction.followup.send(f"📋 Queue: {json.dumps(queue, indent=2)}")
-    except Exception as e:
-        await interaction.followup.send(f"❌ Error: {str(e)}")
+    """Show current queue status (from the last health poll, so it answers at once)."""
+    await interaction.response.send_message(queue_report(interaction.user.id))
 
 
 @tree.command(name="models", description="List available models")
 async def models_command(interaction: discord.Interaction):
     """List available checkpoint models."""
-    await interaction.response.defer()
-    try:
-        models = await get_comfy_models()
-        if models:
-            await interaction.followup.send("📦 Available models:\n" + "\n".join(f"- {m}" for m in models))
-        else:
-            await interaction.followup.send("No models found or ComfyUI unreachable.")
-    except Exception as e:
-        await interaction.followup.send(f"❌ Error: {str(e)}")
+    models = await get_comfy_models()
+    if models:
+        await interaction.response.send_message("📦 Available models:\n" + "\n".join(f"- {m}" for m in models))
+    else:
+        await interaction.response.send_message("No models found or ComfyUI unreachable.")
+
+
+@tree.command(name="stats", description="Show generation latency and throughput")
+async def stats_command(interaction: discord.Interaction):
+    await interaction.response.send_message(metrics.report())
 
 
 @bot.event
@@ -199,37 +427,36 @@ async def on_message(message):
     if content.startswith("!gen "):
         prompt = content[5:].strip()
         if prompt:
-            # Queue generation
+            status_msg = await message.reply(f"⏳ Queued: *{prompt}*")
             try:
-                prompt_id = await queue_comfy_prompt(prompt)
+                await start_generation(
+                    message.author.id,
+                    message.channel.id,
+                    prompt,
+                    message.channel.send,
+                    lambda text: status_msg.edit(content=text),
+                )
                 await message.add_reaction("🎨")
-                await message.reply(f"Queued! ID: `{prompt_id[:8]}...`")
-                
-                # Wait in background
-                images = await wait_for_comfy(prompt_id)
-                
-                if images:
-                    async with aiohttp.ClientSession() as session:
-                        for img in images:
-                            img_data = await download_image(session, img["filename"], img["subfolder"], img["type"])
-                            file = discord.File(fp=io.BytesIO(img_data), filename=img["filename"])
-                            await message.channel.send(file=file)
-                else:
-                    await message.channel.send("❌ Generation timed out")
+            except (JobRejected, WorkflowError) as e:
+                await status_msg.edit(content=f"❌ {e}")
             except Exception as e:
-                await message.reply(f"❌ Error: {str(e)}")
-    
+                traceback.print_exc()
+                await status_msg.edit(content=f"❌ Error: {e}")
+
+    # Handle !cancel [job id]
+    elif content == "!cancel" or content.startswith("!cancel "):
+        await message.reply(cancel_job(message.author.id, content[len("!cancel"):].strip()))
+
     # Handle !queue
     elif content == "!queue":
-        try:
-            queue = await get_comfy_queue()
-            await message.reply(f"📋 Queue: `{json.dumps(queue)}`")
-        except Exception as e:
-            await message.reply(f"❌ Error: {str(e)}")
+        await message.reply(queue_report(message.author.id))
+
+    # Handle !stats
+    elif content == "!stats":
+        await message.reply(metrics.report())
 
 
 if __name__ == "__main__":
-    import io
     if not DISCORD_TOKEN:
         print("Error: DISCORD_BOT_TOKEN not set")
         exit(1)
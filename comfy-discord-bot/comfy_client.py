@@ -0,0 +1,146 @@
+"""Shared HTTP client for ComfyUI.
+
+One long-lived aiohttp session with a keep-alive connection pool serves every
+ComfyUI call the bot makes. Calls no longer pay a TCP/TLS handshake each, and
+the websocket in comfy_ws rides on the same session. Every request has a
+timeout. Idempotent GETs are retried with jittered exponential backoff on
+connection errors, timeouts and 502/503/504. POST /prompt is never retried,
+since a retry could queue the same job twice.
+"""
+
+import asyncio
+import random
+from typing import Optional
+
+import aiohttp
+
+RETRY_STATUSES = {502, 503, 504}
+
+
+class ComfyError(Exception):
+    pass
+
+
+class ComfyClient:
+    def __init__(
+        self,
+        host: str,
+        client_id: str,
+        pool_size: int = 16,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        retries: int = 3,
+        backoff: float = 0.25,
+        max_backoff: float = 4.0,
+    ):
+        self.host = host.rstrip("/")
+        self.client_id = client_id
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("ComfyClient is not started")
+        return self._session
+
+    async def start(self) -> None:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _delay(self, attempt: int) -> float:
+        # "Full jitter": spreads retries from many callers instead of synchronising them.
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def _get(
+        self,
+        path: str,
+        params: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        json: bool = True,
+        retries: Optional[int] = None,
+    ):
+        """GET `path`, retrying transient failures. Returns (status, body); body is None unless status is 200."""
+        req_timeout = aiohttp.ClientTimeout(total=timeout, connect=self.timeout.connect) if timeout else None
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                async with self.session.get(f"{self.host}{path}", params=params, timeout=req_timeout) as resp:
+                    if resp.status == 200:
+                        return resp.status, await (resp.json() if json else resp.read())
+                    if resp.status not in RETRY_STATUSES or attempt == retries:
+                        return resp.status, None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == retries:
+                    raise
+            await asyncio.sleep(self._delay(attempt))
+        raise AssertionError("unreachable")
+
+    async def queue_prompt(self, workflow: dict, prompt_id: str) -> str:
+        payload = {"prompt": workflow, "prompt_id": prompt_id, "client_id": self.client_id}
+        async with self.session.post(f"{self.host}/prompt", json=payload) as resp:
+            if resp.status != 200:
+                raise ComfyError(f"Failed to queue prompt: {await resp.text()}")
+            result = await resp.json()
+            return result.get("prompt_id", prompt_id)
+
+    async def cancel(self, prompt_id: str) -> None:
+        """Drop `prompt_id` from the ComfyUI queue, or interrupt it if it is already executing."""
+        async with self.session.post(f"{self.host}/queue", json={"delete": [prompt_id]}) as resp:
+            resp.raise_for_status()
+        queue = await self.queue()
+        if any(len(row) > 1 and row[1] == prompt_id for row in queue.get("queue_running", [])):
+            async with self.session.post(f"{self.host}/interrupt") as resp:
+                resp.raise_for_status()
+
+    async def history(self, prompt_id: str) -> dict:
+        status, data = await self._get(f"/history/{prompt_id}", timeout=10)
+        return data or {}
+
+    async def queue(self, timeout: float = 10, retries: Optional[int] = None) -> dict:
+        status, data = await self._get("/queue", timeout=timeout, retries=retries)
+        if data is None:
+            raise ComfyError(f"GET /queue failed: {status}")
+        return data
+
+    async def object_info(self, node_class: str, retries: Optional[int] = None) -> dict:
+        status, data = await self._get(f"/object_info/{node_class}", timeout=15, retries=retries)
+        return data or {}
+
+    async def view_into(self, fileobj, filename: str, subfolder: str = "", type: str = "output", chunk_size: int = 64 * 1024) -> int:
+        """Stream an image into `fileobj` and return its size; a retry starts the file over."""
+        params = {"filename": filename, "subfolder": subfolder, "type": type}
+        req_timeout = aiohttp.ClientTimeout(total=120, connect=self.timeout.connect)
+        for attempt in range(self.retries + 1):
+            fileobj.seek(0)
+            fileobj.truncate()
+            try:
+                async with self.session.get(f"{self.host}/view", params=params, timeout=req_timeout) as resp:
+                    if resp.status == 200:
+                        size = 0
+                        async for chunk in resp.content.iter_chunked(chunk_size):
+                            fileobj.write(chunk)
+                            size += len(chunk)
+                        return size
+                    if resp.status not in RETRY_STATUSES or attempt == self.retries:
+                        raise ComfyError(f"Failed to download image: {resp.status}")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self._delay(attempt))
+        raise AssertionError("unreachable")
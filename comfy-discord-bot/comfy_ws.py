@@ -0,0 +1,221 @@
+"""ComfyUI websocket event routing.
+
+One persistent connection to ComfyUI's `/ws?clientId=…` replaces per-job
+history polling. `executing`/`progress`/`executed` events are routed to the
+job waiting on their `prompt_id`, and a job finishes as soon as ComfyUI
+reports it done. While the socket is down, pending jobs fall back to polling
+`/history` until it reconnects. After a reconnect, pending jobs are checked
+once in case they finished while it was away.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+def images_from_outputs(outputs: dict) -> list:
+    """Flatten ComfyUI node outputs into [{node, filename, subfolder, type}]."""
+    images = []
+    for node_id, node_data in outputs.items():
+        for img in node_data.get("images", []):
+            images.append({
+                "node": str(node_id),
+                "filename": img["filename"],
+                "subfolder": img.get("subfolder", ""),
+                "type": img.get("type", "output"),
+            })
+    return images
+
+
+class _Job:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.future: asyncio.Future = loop.create_future()
+        self.outputs: dict = {}
+        self.cached = False  # some nodes were served from cache and sent no `executed`
+        self.on_progress: Optional[ProgressCallback] = None
+        self.started: Optional[float] = None  # monotonic time of execution_start
+
+
+class ComfyEvents:
+    """Routes ComfyUI websocket events to waiting jobs by prompt_id."""
+
+    def __init__(
+        self,
+        host: str,
+        client_id: str,
+        get_history: Callable[[str], Awaitable[dict]],
+        session: Optional[aiohttp.ClientSession] = None,
+        poll_interval: float = 2.0,
+        max_backoff: float = 30.0,
+    ):
+        self.url = f"{host.rstrip('/')}/ws"
+        self.client_id = client_id
+        self.get_history = get_history
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self._session = session
+        self._own_session = session is None
+        self._jobs: dict[str, _Job] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._checks: set[asyncio.Task] = set()
+        self.connected = asyncio.Event()
+
+    async def start(self) -> None:
+        if self._task is None:
+            if self._session is None:
+                self._session = aiohttp.ClientSession()
+            self._task = asyncio.create_task(self._run(), name="comfy-ws")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # -- waiting -----------------------------------------------------------
+
+    def watch(self, prompt_id: str) -> None:
+        """Start collecting events for `prompt_id`; call before queueing it so no event is missed."""
+        if prompt_id not in self._jobs:
+            self._jobs[prompt_id] = _Job(asyncio.get_running_loop())
+
+    def forget(self, prompt_id: str) -> None:
+        self._jobs.pop(prompt_id, None)
+
+    async def wait(
+        self,
+        prompt_id: str,
+        timeout: float = 120,
+        on_progress: Optional[ProgressCallback] = None,
+        timings: Optional[dict] = None,
+    ) -> list:
+        """Output images of `prompt_id` once it completes; [] on timeout.
+
+        If given, `timings["started"]` is set to when ComfyUI started executing it (if that was seen).
+        """
+        job = self._jobs.get(prompt_id)
+        if job is None:
+            # Not watched before queueing: its events may already have gone by.
+            self.watch(prompt_id)
+            job = self._jobs[prompt_id]
+            await self._check_history(prompt_id)
+        job.on_progress = on_progress
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            return []
+        finally:
+            if timings is not None and job.started is not None:
+                timings["started"] = job.started
+            if self._jobs.get(prompt_id) is job:
+                del self._jobs[prompt_id]
+
+    def _resolve(self, prompt_id: str, images: list) -> None:
+        job = self._jobs.get(prompt_id)
+        if job is not None and not job.future.done():
+            job.future.set_result(images)
+
+    def abort(self, prompt_id: str, exc: BaseException) -> None:
+        """Make the wait on `prompt_id` raise `exc` (e.g. because its backend went away)."""
+        job = self._jobs.get(prompt_id)
+        if job is not None and not job.future.done():
+            job.future.set_exception(exc)
+
+    def _fail(self, prompt_id: str, message: str) -> None:
+        self.abort(prompt_id, RuntimeError(message))
+
+    async def _check_history(self, prompt_id: str) -> bool:
+        """Resolve `prompt_id` from /history if it has completed."""
+        try:
+            history = await self.get_history(prompt_id)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+        entry = history.get(prompt_id)
+        if not entry:
+            return False
+        status = entry.get("status", {})
+        if status.get("status_str") == "error":
+            self._fail(prompt_id, "ComfyUI reported an execution error")
+            return True
+        if status.get("completed", False):
+            self._resolve(prompt_id, images_from_outputs(entry.get("outputs", {})))
+            return True
+        return False
+
+    async def _finish(self, prompt_id: str, job: _Job) -> None:
+        if job.cached or not job.outputs:
+            # Cached nodes never send `executed`; /history has the full outputs.
+            if await self._check_history(prompt_id):
+                return
+        self._resolve(prompt_id, images_from_outputs(job.outputs))
+
+    # -- socket ------------------------------------------------------------
+
+    async def _handle(self, msg: dict) -> None:
+        kind, data = msg.get("type"), msg.get("data") or {}
+        job = self._jobs.get(data.get("prompt_id"))
+        if job is None or job.future.done():
+            return  # not ours, or already finished
+        prompt_id = data["prompt_id"]
+        if kind == "execution_start":
+            job.started = time.monotonic()
+        elif (kind == "executing" and data.get("node") is None) or kind == "execution_success":
+            # Finish off the read loop: a history lookup must not hold up other jobs' events.
+            task = asyncio.create_task(self._finish(prompt_id, job))
+            self._checks.add(task)
+            task.add_done_callback(self._checks.discard)
+        elif kind == "progress" and job.on_progress is not None:
+            try:
+                await job.on_progress(int(data.get("value", 0)), int(data.get("max", 0)))
+            except Exception as e:  # noqa: BLE001 - a failed status edit must not stop routing
+                print(f"[comfy-ws] progress callback failed: {e}")
+        elif kind == "executed":
+            job.outputs[str(data.get("node"))] = data.get("output") or {}
+        elif kind == "execution_cached" and data.get("nodes"):
+            job.cached = True
+        elif kind in ("execution_error", "execution_interrupted"):
+            self._fail(prompt_id, data.get("exception_message") or kind.replace("_", " "))
+
+    async def _poll_pending(self) -> None:
+        for prompt_id, job in list(self._jobs.items()):
+            if not job.future.done():
+                await self._check_history(prompt_id)
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                async with self._session.ws_connect(
+                    self.url, params={"clientId": self.client_id}, heartbeat=30
+                ) as ws:
+                    self.connected.set()
+                    backoff = 1.0
+                    await self._poll_pending()  # catch up on anything that finished while disconnected
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            await self._handle(msg.json())
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            break
+                        # BINARY frames are latent previews; not needed.
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as e:
+                print(f"[comfy-ws] connection lost: {type(e).__name__}: {e}")
+            self.connected.clear()
+            # Fall back to history polling until it is time to reconnect.
+            until = time.monotonic() + backoff
+            while True:
+                await self._poll_pending()
+                left = until - time.monotonic()
+                if left <= 0:
+                    break
+                await asyncio.sleep(min(self.poll_interval, left))
+            backoff = min(backoff * 2, self.max_backoff)
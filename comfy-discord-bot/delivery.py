@@ -0,0 +1,142 @@
+"""Getting generated images from ComfyUI to Discord.
+
+Downloads stream into spooled temp files (memory up to SPOOL_MAX, disk
+beyond), all images of a job at once. An image over the upload limit is
+re-encoded to WebP (JPEG if Pillow lacks WebP) and, if still too big,
+downscaled. That happens in a small thread pool so the event loop never
+stalls on it. Delivery packs a job's images into as few messages as
+possible: up to ten attachments and `limit` bytes per message. An Output
+counts the consumers that still have to post it (the job's owner and any
+coalesced followers); the last `release` closes its temp file.
+
+Re-encoding needs Pillow; without it oversized images are sent as they are
+and Discord may refuse them.
+"""
+
+import asyncio
+import contextlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional
+
+import discord
+
+try:
+    from PIL import Image, features
+except ImportError:  # no re-encoding
+    Image = None
+
+SPOOL_MAX = 2 * 1024 * 1024
+MAX_ATTACHMENTS = 10  # per Discord message
+
+_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="reencode")
+
+
+def spooled() -> BinaryIO:
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+
+
+class Output:
+    """One image to post: a spooled temp file, or a file at `path` (a result cache hit)."""
+
+    def __init__(self, name: str, size: int, file: Optional[BinaryIO] = None, path: Optional[str] = None):
+        self.name = name
+        self.size = size
+        self.file = file
+        self.path = path
+        # Uploads of a shared file (the job's owner and coalesced followers) take turns.
+        self.lock = asyncio.Lock()
+        self.users = 1
+
+    def retain(self, n: int = 1) -> None:
+        self.users += n
+
+    def release(self) -> None:
+        """One consumer is done with the image; the last one closes the temp file."""
+        self.users -= 1
+        if self.users <= 0 and self.file is not None:
+            self.file.close()
+
+    def discord_file(self) -> discord.File:
+        if self.file is None:
+            return discord.File(self.path, filename=self.name)
+        self.file.seek(0)
+        return discord.File(self.file, filename=self.name)
+
+    def copy_to(self, path: str) -> None:
+        """Write the image to `path` (blocking; run it in a thread)."""
+        if self.file is None:
+            shutil.copyfile(self.path, path)
+            return
+        self.file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(self.file, f)
+
+
+def _shrink(src: BinaryIO, name: str, limit: int) -> tuple:
+    """Re-encode (and if need be downscale) an image until it fits in `limit` bytes."""
+    src.seek(0)
+    with Image.open(src) as im:
+        im.load()
+    fmt, ext = ("WEBP", ".webp") if features.check("webp") else ("JPEG", ".jpg")
+    if fmt == "JPEG" or im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGB")
+    scale = 1.0
+    while True:
+        frame = im if scale == 1.0 else im.resize((max(1, int(im.width * scale)), max(1, int(im.height * scale))), Image.LANCZOS)
+        for quality in (90, 80, 70):
+            out = spooled()
+            frame.save(out, fmt, quality=quality)
+            if out.tell() <= limit or scale < 0.1:
+                return os.path.splitext(name)[0] + ext, out.tell(), out
+            out.close()
+        scale *= 0.75
+
+
+async def fit(output: Output, limit: int) -> Output:
+    """`output`, or a smaller re-encoded copy if it is over `limit` bytes."""
+    if output.size <= limit or output.file is None:
+        return output
+    if Image is None:
+        print(f"[delivery] {output.name} is {output.size} bytes, over the {limit} byte limit; install Pillow to re-encode")
+        return output
+    name, size, file = await asyncio.get_running_loop().run_in_executor(_pool, _shrink, output.file, output.name, limit)
+    print(f"[delivery] re-encoded {output.name} ({output.size} bytes) as {name} ({size} bytes)")
+    output.file.close()
+    return Output(name, size, file=file)
+
+
+def release(outputs: list) -> None:
+    for out in outputs:
+        out.release()
+
+
+def pack(outputs: list, limit: int) -> list:
+    """Group outputs, in order, into messages of at most MAX_ATTACHMENTS files and `limit` bytes."""
+    groups, current, size = [], [], 0
+    for out in outputs:
+        if current and (len(current) == MAX_ATTACHMENTS or size + out.size > limit):
+            groups.append(current)
+            current, size = [], 0
+        current.append(out)
+        size += out.size
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def deliver(send, outputs: list, limit: int) -> None:
+    """Post `outputs` with `send(files=[...])`, several attachments per message."""
+    for group in pack(outputs, limit):
+        async with contextlib.AsyncExitStack() as stack:
+            for out in sorted(group, key=id):
+                await stack.enter_async_context(out.lock)
+            files = [out.discord_file() for out in group]
+            try:
+                await send(files=files)
+            finally:
+                # discord.File stubs out the wrapped file's close() until it is closed itself.
+                for f in files:
+                    f.close()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""A small fake ComfyUI server for trying the bot without a GPU.
+
+Implements the parts of the ComfyUI API the bot uses: POST /prompt,
+GET /history/{id}, /queue, /object_info/CheckpointLoaderSimple, /view and the
+/ws event stream (executing/progress/executed). Prompts run one at a time and
+"render" a solid-colour PNG per batch item after --steps steps of --step-delay
+seconds each.
+
+    python fake_comfy.py --port 8188
+    COMFY_HOST=http://127.0.0.1:8188 python bot.py
+
+It can also be started from a script: `async with FakeComfy(port=0) as fake:`
+gives a running server at `fake.url`. `await fake.drop_sockets()` cuts every
+websocket, for exercising reconnects.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import struct
+import uuid
+import zlib
+from typing import Optional
+
+from aiohttp import web
+
+
+def solid_png(width: int, height: int, rgb: tuple) -> bytes:
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    row = b"\x00" + bytes(rgb) * width
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeComfy:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8188, steps: int = 4, step_delay: float = 0.05):
+        self.host = host
+        self.port = port
+        self.steps = steps
+        self.step_delay = step_delay
+        self.history: dict[str, dict] = {}
+        self.images: dict[str, bytes] = {}
+        self.pending: list[tuple[str, dict, Optional[str]]] = []
+        self.running: Optional[tuple[str, dict, Optional[str]]] = None
+        self.sockets: dict[str, set[web.WebSocketResponse]] = {}
+        self.requests: dict[str, int] = {}  # path -> count, handy for assertions
+        self.checkpoints = ["sd15_default.safetensors", "sdxl_base_1.0.safetensors"]
+        self._wake = asyncio.Event()
+        self._interrupt = asyncio.Event()
+        self._counter = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.url = ""
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._count])
+        app.router.add_post("/prompt", self.post_prompt)
+        app.router.add_get("/history/{prompt_id}", self.get_history)
+        app.router.add_get("/queue", self.get_queue)
+        app.router.add_post("/queue", self.post_queue)
+        app.router.add_post("/interrupt", self.post_interrupt)
+        app.router.add_get("/object_info/CheckpointLoaderSimple", self.get_checkpoints)
+        app.router.add_get("/view", self.get_view)
+        app.router.add_get("/ws", self.websocket)
+        return app
+
+    async def __aenter__(self) -> "FakeComfy":
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{self.host}:{port}"
+        self._worker = asyncio.create_task(self._work())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._worker.cancel()
+        await self.drop_sockets()
+        await self._runner.cleanup()
+
+    async def drop_sockets(self) -> None:
+        for socks in list(self.sockets.values()):
+            for ws in list(socks):
+                await ws.close()
+
+    @web.middleware
+    async def _count(self, request: web.Request, handler):
+        self.requests[request.path] = self.requests.get(request.path, 0) + 1
+        return await handler(request)
+
+    # -- HTTP --------------------------------------------------------------
+
+    async def post_prompt(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        prompt = body.get("prompt")
+        if not isinstance(prompt, dict) or not prompt:
+            return web.json_response({"error": "no prompt", "node_errors": {}}, status=400)
+        prompt_id = body.get("prompt_id") or str(uuid.uuid4())
+        self._counter += 1
+        self.pending.append((prompt_id, prompt, body.get("client_id")))
+        self._wake.set()
+        return web.json_response({"prompt_id": prompt_id, "number": self._counter, "node_errors": {}})
+
+    async def get_history(self, request: web.Request) -> web.Response:
+        prompt_id = request.match_info["prompt_id"]
+        entry = self.history.get(prompt_id)
+        return web.json_response({prompt_id: entry} if entry else {})
+
+    async def get_queue(self, request: web.Request) -> web.Response:
+        def row(job, n):
+            return [n, job[0], job[1], {"client_id": job[2]}, []]
+
+        running = [row(self.running, 0)] if self.running else []
+        return web.json_response({
+            "queue_running": running,
+            "queue_pending": [row(j, i + 1) for i, j in enumerate(self.pending)],
+        })
+
+    async def post_queue(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if body.get("clear"):
+            self.pending.clear()
+        drop = set(body.get("delete", []))
+        self.pending = [j for j in self.pending if j[0] not in drop]
+        return web.Response()
+
+    async def post_interrupt(self, request: web.Request) -> web.Response:
+        self._interrupt.set()
+        return web.Response()
+
+    async def get_checkpoints(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "CheckpointLoaderSimple": {"input": {"required": {"ckpt_name": [self.checkpoints]}}}
+        })
+
+    async def get_view(self, request: web.Request) -> web.Response:
+        data = self.images.get(request.query.get("filename", ""))
+        if data is None:
+            return web.Response(status=404)
+        return web.Response(body=data, content_type="image/png")
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or uuid.uuid4().hex
+        self.sockets.setdefault(client_id, set()).add(ws)
+        try:
+            await ws.send_json({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": len(self.pending)}}, "sid": client_id}})
+            async for _ in ws:
+                pass
+        finally:
+            self.sockets[client_id].discard(ws)
+        return ws
+
+    # -- execution ---------------------------------------------------------
+
+    async def _send(self, client_id: Optional[str], kind: str, data: dict) -> None:
+        targets = self.sockets.get(client_id, set()) if client_id else {w for s in self.sockets.values() for w in s}
+        for ws in list(targets):
+            try:
+                await ws.send_json({"type": kind, "data": data})
+            except ConnectionError:
+                pass
+
+    async def _work(self) -> None:
+        while True:
+            while not self.pending:
+                self._wake.clear()
+                await self._wake.wait()
+            self.running = self.pending.pop(0)
+            prompt_id, prompt, client_id = self.running
+            self._interrupt.clear()
+            run = asyncio.create_task(self._run_prompt(prompt_id, prompt, client_id))
+            interrupted = asyncio.create_task(self._interrupt.wait())
+            await asyncio.wait({run, interrupted}, return_when=asyncio.FIRST_COMPLETED)
+            interrupted.cancel()
+            if not run.done():
+                run.cancel()
+                self.history[prompt_id] = {
+                    "prompt": [0, prompt_id, prompt, {"client_id": client_id}, []],
+                    "outputs": {},
+                    "status": {"status_str": "error", "completed": False, "messages": []},
+                }
+                await self._send(client_id, "execution_interrupted", {"prompt_id": prompt_id, "node_id": None})
+            self.running = None
+
+    async def _run_prompt(self, prompt_id: str, prompt: dict, client_id: Optional[str]) -> None:
+        await self._send(client_id, "execution_start", {"prompt_id": prompt_id})
+        sampler = next((nid for nid, n in prompt.items() if n.get("class_type") == "KSampler"), None)
+        if sampler:
+            await self._send(client_id, "executing", {"node": sampler, "prompt_id": prompt_id})
+        for step in range(1, self.steps + 1):
+            await asyncio.sleep(self.step_delay)
+            await self._send(client_id, "progress", {"value": step, "max": self.steps, "prompt_id": prompt_id, "node": sampler})
+        outputs = {}
+        for nid, node in prompt.items():
+            if node.get("class_type") != "SaveImage":
+                continue
+            # Colour and batch size come from what feeds this SaveImage, so merged graphs render per branch.
+            upstream = [prompt[u] for u in _upstream(prompt, nid)]
+            batch = next((int(n["inputs"].get("batch_size", 1)) for n in upstream if n.get("class_type") == "EmptyLatentImage"), 1)
+            text = " ".join(str(n["inputs"].get("text", "")) for n in upstream if n.get("class_type") == "CLIPTextEncode")
+            images = []
+            for i in range(batch):
+                digest = hashlib.sha256(f"{text}|{prompt_id}|{i}".encode()).digest()
+                name = f"{node['inputs'].get('filename_prefix', 'ComfyUI')}_{prompt_id[:8]}_{nid}_{i:05}_.png"
+                self.images[name] = solid_png(64, 64, tuple(digest[:3]))
+                images.append({"filename": name, "subfolder": "", "type": "output"})
+            outputs[nid] = {"images": images}
+            await self._send(client_id, "executing", {"node": nid, "prompt_id": prompt_id})
+            await self._send(client_id, "executed", {"node": nid, "output": outputs[nid], "prompt_id": prompt_id})
+        self.history[prompt_id] = {
+            "prompt": [0, prompt_id, prompt, {"client_id": client_id}, list(outputs)],
+            "outputs": outputs,
+            "status": {"status_str": "success", "completed": True, "messages": []},
+        }
+        await self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+
+def _upstream(prompt: dict, node_id: str) -> list:
+    """Ids of every node `node_id` depends on, itself included."""
+    seen, stack = [], [node_id]
+    while stack:
+        nid = stack.pop()
+        if nid in seen or nid not in prompt:
+            continue
+        seen.append(nid)
+        stack += [v[0] for v in prompt[nid].get("inputs", {}).values() if isinstance(v, list) and len(v) == 2 and isinstance(v[0], str)]
+    return seen
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    async with FakeComfy(args.host, args.port, steps=args.steps, step_delay=args.step_delay) as fake:
+        print(f"fake ComfyUI listening on {fake.url}")
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fake ComfyUI server for local bot testing")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8188)
+    ap.add_argument("--steps", type=int, default=20, help="sampler steps per prompt")
+    ap.add_argument("--step-delay", type=float, default=0.1, help="seconds per step")
+    args = ap.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""In-process latency and throughput metrics for the bot.
+
+Each stage of a generation (scheduler wait, ComfyUI queue, GPU execution,
+download, Discord upload, end to end) feeds a rolling window of its last
+`window` samples, from which /stats reports p50/p95/p99. Counters count
+jobs by outcome, cache hits, coalesced requests, ComfyUI runs and images.
+The same numbers can be served in Prometheus text format from a small local
+HTTP endpoint (`MetricsServer`): a summary per stage, with quantiles over
+the window and lifetime `_count`/`_sum`, plus one counter per event.
+"""
+
+import math
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from aiohttp import web
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Display order for /stats; other stages follow alphabetically.
+STAGES = ("wait", "comfy_queue", "execute", "download", "upload", "total", "cache_hit")
+
+
+class Rolling:
+    """The last `size` samples of a latency, plus lifetime count and sum."""
+
+    def __init__(self, size: int = 1000):
+        self.samples: deque = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self, qs=QUANTILES) -> list:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [math.nan for _ in qs]
+        # Nearest rank.
+        return [ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))] for q in qs]
+
+
+class Metrics:
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.stages: dict[str, Rolling] = {}
+        self.counters: Counter = Counter()
+        self.started = time.time()
+        self._done: deque = deque()  # completion times of the last hour, for the rate
+
+    def observe(self, stage: str, seconds: Optional[float]) -> None:
+        if seconds is None or seconds < 0:
+            return
+        rolling = self.stages.get(stage)
+        if rolling is None:
+            rolling = self.stages[stage] = Rolling(self.window)
+        rolling.add(seconds)
+
+    def inc(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+        if name == "jobs_done":
+            now = time.monotonic()
+            self._done.append(now)
+            while self._done and now - self._done[0] > 3600:
+                self._done.popleft()
+
+    def _ordered(self) -> list:
+        return sorted(self.stages, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), s))
+
+    def per_hour(self) -> int:
+        now = time.monotonic()
+        return sum(1 for t in self._done if now - t <= 3600)
+
+    def report(self) -> str:
+        """Plain-text summary for /stats."""
+        uptime = time.time() - self.started
+        c = self.counters
+        lines = [
+            f"⏱️ Up {uptime / 3600:.1f} h — {c['jobs_done']} done ({self.per_hour()} in the last hour), "
+            f"{c['jobs_failed']} failed, {c['jobs_cancelled']} cancelled",
+            f"⚡ {c['cache_hits']} cache hits, {c['coalesced']} coalesced, "
+            f"{c['comfy_runs']} ComfyUI runs, {c['images']} images",
+        ]
+        if self.stages:
+            lines.append("```")
+            lines.append(f"{'stage':<12}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+            for stage in self._ordered():
+                r = self.stages[stage]
+                p50, p95, p99 = r.quantiles()
+                lines.append(f"{stage:<12}{len(r.samples):>6}{p50:>8.2f}s{p95:>8.2f}s{p99:>8.2f}s")
+            lines.append("```")
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        lines = ["# TYPE comfybot_stage_seconds summary"]
+        for stage in self._ordered():
+            r = self.stages[stage]
+            for q, v in zip(QUANTILES, r.quantiles()):
+                lines.append(f'comfybot_stage_seconds{{stage="{stage}",quantile="{q}"}} {v}')
+            lines.append(f'comfybot_stage_seconds_count{{stage="{stage}"}} {r.count}')
+            lines.append(f'comfybot_stage_seconds_sum{{stage="{stage}"}} {r.total}')
+        lines.append("# TYPE comfybot_events_total counter")
+        lines += [f'comfybot_events_total{{event="{k}"}} {v}' for k, v in sorted(self.counters.items())]
+        lines.append("# TYPE comfybot_start_time_seconds gauge")
+        lines.append(f"comfybot_start_time_seconds {self.started}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves `GET /metrics` from a Metrics object; bind it to localhost and scrape it."""
+
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = 9464):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._serve)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f"[metrics] serving http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _serve(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.metrics.prometheus(), content_type="text/plain", charset="utf-8")
@@ -0,0 +1,159 @@
+"""Result cache and request coalescing for generations.
+
+A generation's key is a hash of the exact workflow graph sent to ComfyUI
+(prompt, seed, steps, size, checkpoint, ...) plus the workflow name.
+`ResultCache` keeps finished images on local disk under that key. Entries
+are evicted least-recently-used once the cache grows past its byte budget,
+so a repeated request is answered from disk without touching ComfyUI.
+`Coalescer` lets identical requests that arrive while the first one is
+still queued or running share that one ComfyUI job instead of starting
+their own.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+from collections import OrderedDict
+from typing import Optional
+
+from delivery import Output
+
+
+def workflow_key(workflow: dict, name: str = "default") -> str:
+    canonical = json.dumps({"workflow": name, "graph": workflow}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Images by workflow key under `root`, LRU-evicted beyond `max_bytes` (0 disables the cache)."""
+
+    def __init__(self, root: str, max_bytes: int = 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.json")
+        # key -> {"files": [stored name, ...], "sizes": [...], "bytes": n}, least recently used first.
+        self._index: OrderedDict[str, dict] = OrderedDict()
+        self.size = 0
+        self._lock = asyncio.Lock()
+        if max_bytes and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, encoding="utf-8") as f:
+                    for key, entry in json.load(f):
+                        if os.path.isdir(self._dir(key)):
+                            self._index[key] = entry
+            except (OSError, ValueError):
+                self._index.clear()
+            self.size = sum(e["bytes"] for e in self._index.values())
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> Optional[list]:
+        """The cached result's images as path-backed Outputs, or None."""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        d = self._dir(key)
+        paths = [os.path.join(d, name) for name in entry["files"]]
+        if not all(os.path.exists(p) for p in paths):
+            self.size -= self._index.pop(key)["bytes"]
+            return None
+        self._index.move_to_end(key)
+        # Stored as "<n>_<original name>" to keep the order and tolerate duplicate names.
+        sizes = entry.get("sizes") or [0] * len(paths)
+        return [Output(name.split("_", 1)[1], size, path=p) for name, size, p in zip(entry["files"], sizes, paths)]
+
+    async def put(self, key: str, images: list) -> None:
+        """Store a result's Outputs under `key`, then evict down to the byte budget."""
+        total = sum(out.size for out in images)
+        if not self.max_bytes or not images or total > self.max_bytes:
+            return
+        async with self._lock:
+            names = [f"{i}_{os.path.basename(out.name)}" for i, out in enumerate(images)]
+            await asyncio.to_thread(self._write, key, names, images)
+            if key in self._index:
+                self.size -= self._index.pop(key)["bytes"]
+            self._index[key] = {"files": names, "sizes": [out.size for out in images], "bytes": total}
+            self.size += total
+            evicted = []
+            while self.size > self.max_bytes:
+                old, entry = self._index.popitem(last=False)
+                self.size -= entry["bytes"]
+                evicted.append(old)
+            snapshot = json.dumps(list(self._index.items()))
+            await asyncio.to_thread(self._commit, evicted, snapshot)
+
+    def _write(self, key: str, names: list, images: list) -> None:
+        d = self._dir(key)
+        os.makedirs(d, exist_ok=True)
+        for name, out in zip(names, images):
+            tmp = os.path.join(d, f".{name}.tmp")
+            out.copy_to(tmp)
+            os.replace(tmp, os.path.join(d, name))
+
+    def _commit(self, evicted: list, snapshot: str) -> None:
+        for key in evicted:
+            shutil.rmtree(self._dir(key), ignore_errors=True)
+        self._save(snapshot)
+
+    def _save(self, snapshot: str) -> None:
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(snapshot)
+        os.replace(tmp, self.index_path)
+
+    def save(self) -> None:
+        """Persist the LRU order (gets only reorder in memory)."""
+        if self.max_bytes and os.path.isdir(self.root):
+            self._save(json.dumps(list(self._index.items())))
+
+
+class Coalescer:
+    """One shared future per key for requests that are already queued or running.
+
+    Followers `join` it; the leader resolves it with `finish` or `fail`, and
+    `abandon` cancels it (the leader was cancelled) so followers know to run
+    the request themselves. Each follower that gets images must release them.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, asyncio.Future] = {}
+        self._followers: dict[str, int] = {}
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        fut = self._pending.get(key)
+        if fut is not None:
+            self._followers[key] = self._followers.get(key, 0) + 1
+        return fut
+
+    def lead(self, key: str) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        # Nobody may be following; don't warn about an exception nobody retrieved.
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending[key] = fut
+        return fut
+
+    def finish(self, key: str, images: list) -> None:
+        fut = self._pending.pop(key, None)
+        followers = self._followers.pop(key, 0)
+        if fut is not None and not fut.done():
+            for out in images:
+                out.retain(followers)
+            fut.set_result(images)
+
+    def fail(self, key: str, exc: BaseException) -> None:
+        fut = self._pending.pop(key, None)
+        self._followers.pop(key, None)
+        if fut is not None and not fut.done():
+            fut.set_exception(exc)
+
+    def abandon(self, key: str) -> None:
+        fut = self._pending.pop(key, None)
+        self._followers.pop(key, None)
+        if fut is not None:
+            fut.cancel()
@@ -0,0 +1,211 @@
+"""In-process job scheduler for generation requests.
+
+Handlers submit a `Job` and return immediately; the scheduler runs at most
+`max_in_flight` jobs against ComfyUI at a time and delivers results from the
+job's own task. Waiting jobs are picked round-robin across channels, and
+across users within a channel, so a user with a long backlog cannot starve
+everyone else. Each user has a quota of outstanding jobs and the queue as a
+whole is bounded; `submit` raises `JobRejected` with a message meant for the
+user when either is full. Waiting jobs get a status update whenever their
+position changes.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+
+class JobRejected(Exception):
+    """Raised by `submit`; the message is shown to the user as-is."""
+
+
+@dataclass(eq=False)
+class Job:
+    user_id: int
+    channel_id: int
+    prompt: str
+    # The work itself: queue on ComfyUI, wait, deliver. Runs in the job's own task.
+    run: Callable[["Job"], Awaitable[None]]
+    # Edits the job's status message; failures are ignored.
+    status: Callable[[str], Awaitable[None]]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:6])
+    state: str = "queued"  # queued | running | done | failed | cancelled
+    prompt_id: Optional[str] = None
+    position: Optional[int] = None
+    created: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None  # when it left the queue
+    task: Optional[asyncio.Task] = None
+    # Called once the job leaves the scheduler, however it ends (including cancelled while queued).
+    on_finish: Optional[Callable[["Job"], None]] = field(default=None, repr=False)
+    _status_lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    async def notify(self, text: str) -> None:
+        """Update the status message; updates are applied in order and never raise."""
+        async with self._status_lock:
+            try:
+                await self.status(text)
+            except Exception as e:  # noqa: BLE001 - status edits are best effort
+                print(f"[scheduler] status update for {self.id} failed: {type(e).__name__}: {e}")
+
+
+class JobScheduler:
+    def __init__(self, max_in_flight: int = 2, max_queued: int = 50, per_user: int = 3):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max_queued
+        self.per_user = per_user
+        # channel -> user -> that user's waiting jobs, each level in round-robin order.
+        self._waiting: OrderedDict[int, OrderedDict[int, deque]] = OrderedDict()
+        self._queued = 0
+        # Dispatch tick at which each channel / (channel, user) was last served, so newcomers
+        # line up ahead of whoever was served most recently instead of behind them. Entries
+        # go once their key has no queued or running jobs, so the table stays small.
+        self._tick = 0
+        self._served: dict = {}
+        self.running: dict[str, Job] = {}
+        self.jobs: dict[str, Job] = {}  # every queued or running job by id
+        self._notes: set[asyncio.Task] = set()
+
+    # -- submission / cancellation -----------------------------------------
+
+    def outstanding(self, user_id: int) -> list:
+        return [j for j in self.jobs.values() if j.user_id == user_id]
+
+    def submit(self, job: Job) -> int:
+        """Queue `job`; returns its position (1 = next to start)."""
+        if self.per_user and len(self.outstanding(job.user_id)) >= self.per_user:
+            raise JobRejected(f"You already have {self.per_user} jobs queued or running; wait for one to finish or `/cancel` one.")
+        if self._queued >= self.max_queued:
+            raise JobRejected(f"The queue is full ({self.max_queued} jobs waiting). Try again in a few minutes.")
+        users = self._waiting.get(job.channel_id)
+        if users is None:
+            users = self._line_up(self._waiting, job.channel_id, OrderedDict(), lambda c: c)
+        q = users.get(job.user_id)
+        if q is None:
+            q = self._line_up(users, job.user_id, deque(), lambda u: (job.channel_id, u))
+        q.append(job)
+        self._queued += 1
+        self.jobs[job.id] = job
+        self._pump()
+        return job.position or 0
+
+    def cancel(self, job_id: str, user_id: int) -> Optional[Job]:
+        """Cancel one of `user_id`'s jobs, queued or running. Returns it, or None if there is no such job."""
+        job = self.jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        if job.state == "queued":
+            users = self._waiting[job.channel_id]
+            users[job.user_id].remove(job)
+            if not users[job.user_id]:
+                del users[job.user_id]
+                if not users:
+                    del self._waiting[job.channel_id]
+            self._queued -= 1
+            self._finish(job, "cancelled")
+            self._note(job, f"🛑 Cancelled #{job.id}.")
+            self._update_positions()
+        elif job.task is not None:
+            job.task.cancel()  # _run marks it cancelled and frees the slot
+        return job
+
+    # -- dispatch -----------------------------------------------------------
+
+    def _line_up(self, line: OrderedDict, key, value, served_key: Callable):
+        """Add `key` to a round-robin line, ahead of every entry served more recently than it."""
+        line[key] = value
+        rank = self._served.get(served_key(key), 0)
+        for k in [k for k in line if k != key]:
+            if self._served.get(served_key(k), 0) > rank:
+                line.move_to_end(k)
+        return value
+
+    @staticmethod
+    def _pop(waiting: OrderedDict) -> Job:
+        channel, users = next(iter(waiting.items()))
+        user, q = next(iter(users.items()))
+        job = q.popleft()
+        # Rotate: this user goes to the back of the channel, the channel to the back of the line.
+        users.move_to_end(user)
+        if not q:
+            del users[user]
+        waiting.move_to_end(channel)
+        if not users:
+            del waiting[channel]
+        return job
+
+    def order(self) -> list:
+        """Waiting jobs in the order they would start."""
+        waiting = OrderedDict(
+            (c, OrderedDict((u, deque(q)) for u, q in users.items())) for c, users in self._waiting.items()
+        )
+        out = []
+        while waiting:
+            out.append(self._pop(waiting))
+        return out
+
+    def _next(self) -> Optional[Job]:
+        if not self._waiting:
+            return None
+        self._queued -= 1
+        job = self._pop(self._waiting)
+        self._tick += 1
+        self._served[job.channel_id] = self._served[(job.channel_id, job.user_id)] = self._tick
+        return job
+
+    def _pump(self) -> None:
+        while len(self.running) < self.max_in_flight:
+            job = self._next()
+            if job is None:
+                break
+            job.state = "running"
+            job.started = time.monotonic()
+            job.position = None
+            self.running[job.id] = job
+            job.task = asyncio.create_task(self._run(job), name=f"job-{job.id}")
+        self._update_positions()
+
+    async def _run(self, job: Job) -> None:
+        state = "failed"
+        try:
+            await job.run(job)
+            state = "done"
+        except asyncio.CancelledError:
+            state = "cancelled"
+            self._note(job, f"🛑 Cancelled #{job.id}.")
+        except Exception as e:  # noqa: BLE001 - keep the scheduler alive whatever a job does
+            print(f"[scheduler] job {job.id} failed: {type(e).__name__}: {e}")
+            self._note(job, f"❌ Error: {e}")
+        finally:
+            self.running.pop(job.id, None)
+            self._finish(job, state)
+            self._pump()
+
+    def _finish(self, job: Job, state: str) -> None:
+        job.state = state
+        job.position = None
+        self.jobs.pop(job.id, None)
+        if not any(j.channel_id == job.channel_id and j.user_id == job.user_id for j in self.jobs.values()):
+            self._served.pop((job.channel_id, job.user_id), None)
+            if not any(j.channel_id == job.channel_id for j in self.jobs.values()):
+                self._served.pop(job.channel_id, None)
+        if job.on_finish is not None:
+            job.on_finish(job)
+
+    def _update_positions(self) -> None:
+        for pos, job in enumerate(self.order(), 1):
+            if job.position != pos:
+                # Deep in the queue only the first position is posted, to stay clear of Discord's edit rate limits.
+                if job.position is None or pos <= 10:
+                    self._note(job, f"⏳ Queued #{job.id} — position {pos} ({len(self.running)} running).")
+                job.position = pos
+
+    def _note(self, job: Job, text: str) -> None:
+        task = asyncio.create_task(job.notify(text))
+        self._notes.add(task)
+        task.add_done_callback(self._notes.discard)
+
+    def summary(self) -> str:
+        return f"{len(self.running)}/{self.max_in_flight} running, {self._queued}/{self.max_queued} waiting"
@@ -0,0 +1,252 @@
+"""Workflow templates for /gen.
+
+Every `*.json` in the workflows directory (ComfyUI "API format") is loaded
+and validated once. Nodes whose inputs take the prompt, negative prompt,
+seed, image size and batch size are found by `class_type`, not by
+hardcoded node ids. `WorkflowTemplate.build` then only copies the graph and
+fills those inputs in, so the request path does no disk I/O. A background
+task stats the directory every few seconds and reloads a template only when
+its mtime changes. A file that fails to parse or validate is logged and the
+previous version is kept.
+"""
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+SAMPLERS = {"KSampler": "seed", "KSamplerAdvanced": "noise_seed", "SamplerCustom": "noise_seed"}
+TEXT_ENCODERS = {"CLIPTextEncode", "CLIPTextEncodeSDXL"}
+LATENTS = {"EmptyLatentImage", "EmptySD3LatentImage"}
+OUTPUTS = {"SaveImage", "PreviewImage"}
+
+# Built-in "default" workflow, used unless workflows/default.json exists.
+DEFAULT_GRAPH = {
+    "3": {"inputs": {"seed": 0, "steps": 20, "cfg": 8, "sampler_name": "euler", "scheduler": "normal", "denoise": 1, "model": ["4", 0], "positive": ["6", 0], "negative": ["7", 0], "latent_image": ["5", 0]}, "class_type": "KSampler"},
+    "4": {"inputs": {"ckpt_name": "sd15_default.json"}, "class_type": "CheckpointLoaderSimple"},
+    "5": {"inputs": {"width": 512, "height": 512, "batch_size": 1}, "class_type": "EmptyLatentImage"},
+    "6": {"inputs": {"text": "", "clip": ["4", 1]}, "class_type": "CLIPTextEncode"},
+    "7": {"inputs": {"text": "", "clip": ["4", 1]}, "class_type": "CLIPTextEncode"},
+    "8": {"inputs": {"vae_name": "vae-ft-mse-840000-ema-pruned.safetensors"}, "class_type": "VAELoader"},
+    "9": {"inputs": {"samples": ["3", 0], "vae": ["8", 0]}, "class_type": "VAEDecode"},
+    "10": {"inputs": {"images": ["9", 0], "filename_prefix": "discord"}, "class_type": "SaveImage"},
+}
+
+
+class WorkflowError(ValueError):
+    pass
+
+
+def _link(value) -> Optional[str]:
+    """Node id of an input wired to another node's output (`[node_id, slot]`), else None."""
+    if isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int):
+        return value[0]
+    return None
+
+
+def _text_inputs(node: dict) -> list:
+    # CLIPTextEncodeSDXL has two text boxes; fill both.
+    return [k for k in ("text", "text_g", "text_l") if k in node["inputs"]]
+
+
+@dataclass
+class WorkflowTemplate:
+    name: str
+    graph: dict
+    mtime: float = 0.0
+    # Injection points: parameter -> [(node_id, input_name), ...]
+    points: dict = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, name: str, graph, mtime: float = 0.0) -> "WorkflowTemplate":
+        if not isinstance(graph, dict) or not graph or "nodes" in graph:
+            raise WorkflowError(f"{name}: not an API-format workflow (export it with \"Save (API Format)\")")
+        for nid, node in graph.items():
+            if not isinstance(node, dict) or not isinstance(node.get("class_type"), str) or not isinstance(node.get("inputs"), dict):
+                raise WorkflowError(f"{name}: node {nid} needs a class_type and an inputs object")
+            for key, value in node["inputs"].items():
+                src = _link(value)
+                if src is not None and src not in graph:
+                    raise WorkflowError(f"{name}: node {nid} input {key} links to missing node {src}")
+        if not any(n["class_type"] in OUTPUTS for n in graph.values()):
+            raise WorkflowError(f"{name}: no SaveImage/PreviewImage node, so ComfyUI would produce no images")
+
+        points: dict = {"prompt": [], "negative": [], "seed": [], "width": [], "height": [], "batch": []}
+        for nid, node in graph.items():
+            inputs = node["inputs"]
+            seed_key = SAMPLERS.get(node["class_type"])
+            if seed_key is None:
+                if node["class_type"] in LATENTS:
+                    for param, key in (("width", "width"), ("height", "height"), ("batch", "batch_size")):
+                        if key in inputs:
+                            points[param].append((nid, key))
+                continue
+            if seed_key in inputs:
+                points["seed"].append((nid, seed_key))
+            # The sampler's positive/negative conditioning says which text encoder is which.
+            for param, key in (("prompt", "positive"), ("negative", "negative")):
+                src = _link(inputs.get(key))
+                if src is not None and graph[src]["class_type"] in TEXT_ENCODERS:
+                    points[param] += [(src, k) for k in _text_inputs(graph[src])]
+        if not points["prompt"]:
+            # No sampler wired to a text encoder: fall back to the first encoder that isn't the negative one.
+            negative = {nid for nid, _ in points["negative"]}
+            first = next((nid for nid, n in graph.items() if n["class_type"] in TEXT_ENCODERS and nid not in negative), None)
+            if first is None:
+                raise WorkflowError(f"{name}: no text encoder node to put the prompt in")
+            points["prompt"] = [(first, k) for k in _text_inputs(graph[first])]
+        return cls(name, graph, mtime, {k: sorted(set(v)) for k, v in points.items()})
+
+    @classmethod
+    def load(cls, path: str) -> "WorkflowTemplate":
+        name = os.path.splitext(os.path.basename(path))[0]
+        mtime = os.stat(path).st_mtime
+        try:
+            with open(path, encoding="utf-8") as f:
+                graph = json.load(f)
+        except ValueError as e:
+            raise WorkflowError(f"{name}: invalid JSON: {e}") from None
+        return cls.parse(name, graph, mtime)
+
+    def build(
+        self,
+        prompt: str,
+        negative: Optional[str] = None,
+        seed: Optional[int] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        batch: Optional[int] = None,
+    ) -> dict:
+        """A copy of the graph with the given parameters filled in (None keeps the template's value)."""
+        # Nodes and their inputs dicts are copied; untouched input values (links, lists) are shared, never mutated.
+        graph = {nid: {**node, "inputs": dict(node["inputs"])} for nid, node in self.graph.items()}
+        values = {"prompt": prompt, "negative": negative, "seed": seed, "width": width, "height": height, "batch": batch}
+        for param, value in values.items():
+            if value is None:
+                continue
+            for nid, key in self.points[param]:
+                graph[nid]["inputs"][key] = value
+        return graph
+
+
+def _topo_order(graph: dict) -> list:
+    order, state = [], {}
+    for root in graph:
+        stack = [(root, False)]
+        while stack:
+            nid, done = stack.pop()
+            if done:
+                state[nid] = "done"
+                order.append(nid)
+                continue
+            if state.get(nid) == "done":
+                continue
+            if state.get(nid) == "open":
+                raise WorkflowError(f"cycle through node {nid}")
+            state[nid] = "open"
+            stack.append((nid, True))
+            for value in graph[nid]["inputs"].values():
+                src = _link(value)
+                if src is not None and state.get(src) != "done":
+                    stack.append((src, False))
+    return order
+
+
+def merge_workflows(graphs: list) -> tuple:
+    """Merge several workflow graphs into one, sharing nodes that are identical across them.
+
+    Loaders, empty latents and other nodes whose class and (rewired) inputs match are
+    kept once rather than repeated per request; each request keeps its own sampler and
+    output chain. Output nodes are never shared. Returns (merged graph, {merged output node id: index into graphs}).
+    """
+    merged: dict = {}
+    owners: dict = {}
+    seen: dict = {}  # node signature -> merged id
+    for i, graph in enumerate(graphs):
+        ids: dict = {}  # this graph's node id -> merged id
+        for nid in _topo_order(graph):
+            node = graph[nid]
+            inputs = {k: [ids[v[0]], v[1]] if _link(v) is not None else v for k, v in node["inputs"].items()}
+            output = node["class_type"] in OUTPUTS
+            sig = json.dumps([node["class_type"], inputs, i if output else None], sort_keys=True)
+            mid = seen.get(sig)
+            if mid is None:
+                mid = seen[sig] = str(len(merged) + 1)
+                merged[mid] = {**node, "inputs": inputs}
+            ids[nid] = mid
+            if output:
+                owners[mid] = i
+    return merged, owners
+
+
+class WorkflowRegistry:
+    def __init__(self, directory: str = "workflows", interval: float = 5.0):
+        self.directory = directory
+        self.interval = interval
+        self.templates: dict[str, WorkflowTemplate] = {}
+        self._broken: dict[str, float] = {}  # name -> mtime of a file that failed to load
+        self._task: Optional[asyncio.Task] = None
+        self.refresh()
+
+    def names(self) -> list:
+        return sorted(set(self.templates) | {"default"})
+
+    def get(self, name: str = "default") -> WorkflowTemplate:
+        template = self.templates.get(name)
+        if template is None:
+            if name == "default":
+                return _DEFAULT
+            raise WorkflowError(f"Unknown workflow `{name}`. Available: {', '.join(self.names())}")
+        return template
+
+    def refresh(self) -> None:
+        """(Re)load templates whose file is new or has a new mtime; drop deleted ones.
+
+        Runs off the event loop, so it builds a new dict and swaps it in rather than mutating.
+        """
+        try:
+            entries = {
+                e.name[:-5]: (e.path, e.stat().st_mtime)
+                for e in os.scandir(self.directory)
+                if e.name.endswith(".json") and e.is_file()
+            }
+        except FileNotFoundError:
+            entries = {}
+        templates = {name: t for name, t in self.templates.items() if name in entries}
+        for name in set(self.templates) - set(templates):
+            print(f"[workflows] removed {name}")
+        for name, (path, mtime) in entries.items():
+            current = templates.get(name)
+            if (current is not None and current.mtime == mtime) or self._broken.get(name) == mtime:
+                continue
+            try:
+                templates[name] = WorkflowTemplate.load(path)
+            except (OSError, WorkflowError) as e:
+                print(f"[workflows] {e}" + ("; keeping the previous version" if current else ""))
+                self._broken[name] = mtime
+                continue
+            self._broken.pop(name, None)
+            print(f"[workflows] {'reloaded' if current else 'loaded'} {name}")
+        self.templates = templates
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch(), name="workflow-reload")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.refresh)
+
+
+_DEFAULT = WorkflowTemplate.parse("default", DEFAULT_GRAPH)